@@ -1,35 +1,101 @@
 import os
 import ast
 import json
+import re
+import hashlib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import networkx as nx
 import matplotlib.pyplot as plt
-from ontology import Ontology
+from ontology import Ontology, profiling
+from ontology.analysis import analyze as analyze_graph
+from ontology.layouts import LAYOUTS
+from ontology.serializers import write_graph_binary, write_node_link_json
+
+# Engines for extracting imports, "walk" visits every node of the AST and is the reference,
+# "toplevel" only reads the top level statements and falls back to "walk" when it has to.
+ENGINES = ("toplevel", "walk")
+IMPORT_KEYWORD = re.compile(r"\bimport\b")
+IMPORT_LINE = re.compile(r"^(?:import|from)\b", re.MULTILINE)
+# Past this many edges the svg is drawn without arrows, see visualize_graph
+MAX_ARROW_EDGES = 500
 
 # Function to extract imports from a single Python file
-def extract_imports_from_file(file_path):
+def extract_imports_from_file(file_path, engine="toplevel"):
     with open(file_path, "r", encoding="utf-8") as f:
-        tree = ast.parse(f.read(), filename=file_path)
+        source = f.read()
+
+    if engine == "toplevel":
+        imports = extract_toplevel_imports(source, file_path)
+        if imports is not None:
+            return imports
 
+    return extract_imports_from_tree(ast.parse(source, filename=file_path))
+
+# Function to find every import statement anywhere in the AST
+def extract_imports_from_tree(tree):
     imports = []
 
     # Traverse the AST to find import statements
     for node in ast.walk(tree):
-        # Handling "import module" statements
-        if isinstance(node, ast.Import):
-            for alias in node.names:
-                imports.append(alias.name)
-        
-        # Handling "from module import ..." statements
-        elif isinstance(node, ast.ImportFrom):
-            if node.module is not None:  # Ignore relative imports (node.level > 0)
-                imports.append(node.module)
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports.extend(imports_from_node(node))
 
     return imports
 
-# Function to walk through a directory and gather all imports
-def gather_imports_from_codebase(codebase_path):
-    imports_graph = {}
-    
+# Function to describe an import statement as strings, these are resolved to modules later by ModuleIndex.
+#   import a.b             -> "a.b"
+#   from a.b import c, d   -> "a.b:c", "a.b:d"
+#   from ..a import c      -> "..a:c"
+def imports_from_node(node):
+    # Handling "import module" statements
+    if isinstance(node, ast.Import):
+        return [alias.name for alias in node.names]
+
+    # Handling "from module import ..." statements, including relative ones
+    module = "." * node.level + (node.module or "")
+    return [f"{module}:{alias.name}" for alias in node.names]
+
+# Function to read the imports from the top level statements only, returns None if that could miss some.
+# Every import statement holds exactly one "import" keyword, so when the top level statements account
+# for every keyword in the source there can be no nested imports and the result matches ast.walk.
+def extract_toplevel_imports(source, file_path="<unknown>"):
+    matches = list(IMPORT_KEYWORD.finditer(source))
+    keywords = len(matches)
+    if keywords == 0:
+        return []
+
+    # An import keyword that doesn't start a line is nested, or inside a string or comment
+    if len(IMPORT_LINE.findall(source)) != keywords:
+        return None
+
+    # Imports are usually at the top, so try parsing only up to the line of the last one.
+    # A prefix cut inside a bracket or string fails to parse, so then parse the whole file.
+    end = source.find("\n", matches[-1].end())
+    try:
+        tree = ast.parse(source[:end] if end != -1 else source, filename=file_path)
+    except SyntaxError:
+        tree = ast.parse(source, filename=file_path)
+
+    imports = []
+    found = 0
+    for node in tree.body:
+        if found == keywords:  # Every keyword is accounted for, stop early
+            break
+
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            found += 1
+            imports.extend(imports_from_node(node))
+
+    return imports if found == keywords else None
+
+# Function to list the python files of a codebase along with their module names
+def find_python_files(codebase_path):
+    python_files = []
+
     # Walk through the directory recursively
     for root, _, files in os.walk(codebase_path):
         for file in files:
@@ -39,61 +105,504 @@ def gather_imports_from_codebase(codebase_path):
                 if len(module_name) > 3 and module_name[-3:].strip() == ".py":
                     
                     module_name = str(module_name[:-3])
-                # Extract imports from this file
-                imports = extract_imports_from_file(file_path)
-                
-                # Add the imports to the graph
-                if module_name not in imports_graph:
-                    imports_graph[module_name] = []
-                imports_graph[module_name].extend(imports)
+                python_files.append((module_name, file_path))
+
+    return python_files
+
+
+# Function to extract the imports of many files, serially or across a process pool
+def extract_imports_from_files(file_paths, jobs=1, engine="toplevel"):
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    if jobs <= 1 or len(file_paths) < 2:
+        return [extract_imports_from_file(file_path, engine) for file_path in file_paths]
+
+    # Hand the files to the workers in batches, a few batches per worker keeps them evenly loaded.
+    # map() yields results in submission order, so the merge below is deterministic.
+    chunksize = max(1, len(file_paths) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(partial(extract_imports_from_file, engine=engine), file_paths, chunksize=chunksize))
+
+
+# Function to extract the imports of one file with an engine, the error is returned when it can't be parsed
+def extract_imports_or_error(file_path, engine):
+    try:
+        return extract_imports_from_file(file_path, engine)
+    except (SyntaxError, ValueError, UnicodeDecodeError) as error:
+        return type(error).__name__
+
+
+# Function to check that every engine extracts the same imports as "walk", the reference, from each file of a codebase.
+# Files walk can't parse aren't compared, "toplevel" may not need to parse them. Changes to the engines must pass
+# it, see benchmark.py --parity.
+def check_engine_parity(codebase_path, engines=ENGINES, jobs=1):
+    file_paths = [file_path for _, file_path in find_python_files(codebase_path)]
+    timings = {}
+    extracted = {}
+    for engine in ("walk", *(engine for engine in engines if engine != "walk")):
+        start = time.perf_counter()
+        if jobs == 1:
+            extracted[engine] = [extract_imports_or_error(file_path, engine) for file_path in file_paths]
+        else:
+            with ProcessPoolExecutor(max_workers=jobs or None) as executor:
+                extracted[engine] = list(executor.map(extract_imports_or_error, file_paths, [engine] * len(file_paths),
+                                                      chunksize=max(1, len(file_paths) // 64)))
+        timings[engine] = time.perf_counter() - start
+
+    mismatches = [
+        {"file": file_path, "engine": engine, "walk": reference, engine: extracted[engine][i]}
+        for engine in extracted if engine != "walk"
+        for i, (file_path, reference) in enumerate(zip(file_paths, extracted["walk"]))
+        if extracted[engine][i] != reference and not isinstance(reference, str)
+    ]
+    return {
+        "codebase": codebase_path,
+        "files": len(file_paths),
+        "unparsable": sum(isinstance(imports, str) for imports in extracted["walk"]),
+        "stages": timings,
+        "mismatches": mismatches,
+    }
+
+
+# Persistent cache of the imports extracted from each file, so unchanged files skip ast.parse
+class ImportCache:
+    # Bump this whenever the extracted imports change format, it empties old caches.
+    VERSION = 2
+
+    def __init__(self, cache_path):
+        self.connection = sqlite3.connect(cache_path)
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != self.VERSION:
+            self.connection.execute("DROP TABLE IF EXISTS files")
+            self.connection.execute(f"PRAGMA user_version = {self.VERSION}")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files "
+            "(path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, digest TEXT, imports TEXT)"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def extract_imports_from_files(self, file_paths, jobs=1, engine="toplevel"):
+        entries = {row[0]: row[1:] for row in self.connection.execute("SELECT * FROM files")}
+        file_imports = [None] * len(file_paths)
+        updates = []
+        misses = []
+
+        for i, file_path in enumerate(file_paths):
+            key = os.path.abspath(file_path)
+            stat = os.stat(file_path)
+            entry = entries.get(key)
+
+            # Same mtime and size, trust the cached imports without reading the file
+            if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                file_imports[i] = json.loads(entry[3])
+                continue
+
+            # Touched but identical content (eg: a branch switch), only the stat needs refreshing
+            with open(file_path, "rb") as f:
+                digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+            if entry and entry[2] == digest:
+                file_imports[i] = json.loads(entry[3])
+                updates.append((key, stat.st_mtime_ns, stat.st_size, digest, entry[3]))
+                continue
+
+            misses.append((i, key, stat, digest))
+
+        # Only the new or changed files are parsed
+        parsed = extract_imports_from_files([file_paths[i] for i, *_ in misses], jobs, engine)
+        for (i, key, stat, digest), imports in zip(misses, parsed):
+            file_imports[i] = imports
+            updates.append((key, stat.st_mtime_ns, stat.st_size, digest, json.dumps(imports)))
+
+        # Evict deleted or renamed files
+        seen = {os.path.abspath(file_path) for file_path in file_paths}
+        removed = [(key,) for key in entries if key not in seen]
+
+        self.connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", updates)
+        self.connection.executemany("DELETE FROM files WHERE path = ?", removed)
+        self.connection.commit()
+        return file_imports
+
+
+# Maps dotted import paths to the modules of the codebase, so each import resolves with a dict lookup
+class ModuleIndex:
+    def __init__(self, module_names):
+        module_names = list(module_names)
+        self.modules = {name: name for name in module_names}
+
+        # Packages are imported by their directory, which wins over a module of the same name
+        for name in module_names:
+            if name.endswith(".__init__"):
+                self.modules[name[:-len(".__init__")]] = name
+
+    def __contains__(self, module_name):
+        return module_name in self.modules
+
+    def resolve(self, entry, importer):
+        """ Returns the module that an entry from imports_from_node refers to and whether it is in the codebase.
+
+            Relative imports are made absolute from the importer's package, and "from a import b" points to
+            the submodule a.b when the codebase has one.
+        """
+        path, _, name = entry.partition(":")
+        written = path if path.strip(".") else path + name  # "from . import x" is shown as ".x"
+
+        level = len(path) - len(path.lstrip("."))
+        if level:
+            package = importer.split(".")[:-1]  # The package of both "a.b" and "a.__init__" is "a"
+            if level - 1 > len(package):  # Beyond the codebase, keep it as written
+                return written, False
+            parts = package[:len(package) - (level - 1)]
+            path = ".".join(parts + [path[level:]] if path[level:] else parts)
+
+        if name and name != "*":
+            submodule = f"{path}.{name}" if path else name
+            if submodule in self.modules:
+                return self.modules[submodule], True
+
+        if path in self.modules:
+            return self.modules[path], True
+        return path or written, False
+
+
+# Function to extract the imports of every python file in the codebase
+def gather_file_imports(codebase_path, jobs=1, cache_path=None, engine="toplevel"):
+    with profiling.stage("gather_file_imports.walk"):
+        python_files = find_python_files(codebase_path)
+    file_paths = [file_path for _, file_path in python_files]
+    with profiling.stage("gather_file_imports.parse"):
+        if cache_path is None:
+            file_imports = extract_imports_from_files(file_paths, jobs, engine)
+        else:
+            with ImportCache(cache_path) as cache:
+                file_imports = cache.extract_imports_from_files(file_paths, jobs, engine)
+
+    return [(module_name, file_path, imports) for (module_name, file_path), imports in zip(python_files, file_imports)]
+
+
+# Function to walk through a directory and gather all imports
+def gather_imports_from_codebase(codebase_path, jobs=1, cache_path=None, engine="toplevel"):
+    imports_graph = {}
+
+    file_imports = gather_file_imports(codebase_path, jobs, cache_path, engine)
+    with profiling.stage("gather_imports_from_codebase.resolve"):
+        index = ModuleIndex(module_name for module_name, _, _ in file_imports)
+        for module_name, _, imports in file_imports:
+            # Add the imports to the graph
+            if module_name not in imports_graph:
+                imports_graph[module_name] = []
+            resolved = (index.resolve(entry, module_name)[0] for entry in imports)
+            imports_graph[module_name].extend(dict.fromkeys(resolved))  # "from a import b, c" is one edge
     
     return imports_graph
 
 
-# Function to build the import graph and export it to JSON
-def create_import_graph(codebase_path, output_json_path):
-    imports_graph = gather_imports_from_codebase(codebase_path)
-    
+# Function to build the import graph from the gathered imports
+@profiling.profiled()
+def build_import_graph(imports_graph):
     # Create a directed graph using NetworkX
     G = nx.DiGraph()
     
-    # Add edges based on the imports
+    # Add edges based on the imports, an edge is internal when the codebase has the imported module
     for module, dependencies in imports_graph.items():
         for dep in dependencies:
-            G.add_edge(dep, module)
-    
-    # Convert the graph to a JSON-compatible format
-    graph_data = nx.node_link_data(G)
-    
-    # Write the graph to a JSON file
-    with open(output_json_path + ".json", "w", encoding="utf-8") as f:
-        json.dump(graph_data, f, indent=4)
+            G.add_edge(dep, module, internal=dep in imports_graph)
+
+    return G
+
+
+# Function to export the import graph to JSON and HTML
+def export_import_graph(G, output_json_path, show=False, compact=False, compress=False, binary=False, cluster=None, cluster_depth=1,
+                        static_layout=False):
+    # Write the graph to a JSON file in node-link format, streamed so the whole document is never in memory
+    json_path = output_json_path + (".json.gz" if compress else ".json")
+    write_node_link_json(G, json_path, indent=None if compact else 4)
+
+    # The binary export loads much faster, see ontology.serializers.CSRGraph
+    if binary:
+        write_graph_binary(G, output_json_path + ".csr")
     
     print(f"Import graph exported to {output_json_path}")
 
+    # With cluster, modules are collapsed into packages or communities, see ontology.webpages.ClusteredVisualizer
+    # With static_layout, the positions are computed here (and cached) instead of by the browser's physics
     o = Ontology(G)
-    o.create_visualization(output_json_path + ".html", show=True)
-    visualize_graph(G)
+    if cluster == "module":
+        o.create_visualization(output_json_path + ".html", show=show, cluster=cluster, static_layout=static_layout,
+                               depth=cluster_depth)
+    else:
+        o.create_visualization(output_json_path + ".html", show=show, cluster=cluster, static_layout=static_layout)
+
+
+# Function to find the import cycles, most imported modules and layers, written to <output>.analysis.json
+def analyze_import_graph(G, output_json_path, top_count=20):
+    report = analyze_graph(G, top_count)
+    # Edges go from the dependency to the importing module
+    report["most_imported"] = report.pop("out_degree")
+    report["most_importing"] = report.pop("in_degree")
+
+    with open(output_json_path + ".analysis.json", "w") as f:
+        json.dump(report, f, indent=4)
+
+    print(f"{report['nodes']} modules, {report['edges']} imports, {len(report['cycles'])} import cycles, "
+          f"{len(report['layers'])} layers")
+    for stage, seconds in report["timings"].items():
+        print(f"  {stage}: {seconds:.3f}s")
+    print(f"Analysis exported to {output_json_path}.analysis.json")
+    return report
+
+
+# Function to build the import graph and export it to JSON
+def create_import_graph(codebase_path, output_json_path, jobs=1, cache=True, engine="toplevel", svg_path="a.svg", layout="force",
+                        compact=False, compress=False, binary=False, analyze=False, cluster=None, cluster_depth=1,
+                        static_layout=False):
+    cache_path = output_json_path + ".cache.sqlite" if cache else None
+    G = build_import_graph(gather_imports_from_codebase(codebase_path, jobs, cache_path, engine))
+    export_import_graph(G, output_json_path, show=True, compact=compact, compress=compress, binary=binary,
+                        cluster=cluster, cluster_depth=cluster_depth, static_layout=static_layout)
+    if analyze:
+        analyze_import_graph(G, output_json_path)
+    if svg_path:
+        visualize_graph(G, svg_path, layout)
+    return G
+
+
+# Keeps the import graph in memory and re-exports it whenever the codebase changes
+class ImportGraphWatcher:
+    def __init__(self, codebase_path, output_json_path, jobs=1, cache=True, engine="toplevel", interval=1.0, debounce=0.5,
+                 compact=False, compress=False, binary=False, cluster=None, cluster_depth=1, static_layout=False):
+        self.codebase_path = codebase_path
+        self.output_json_path = output_json_path
+        self.cache_path = output_json_path + ".cache.sqlite" if cache else None
+        self.jobs = jobs
+        self.engine = engine
+        self.interval = interval  # Seconds between polls when watchdog isn't installed
+        self.debounce = debounce  # Seconds without changes before a burst of changes is applied
+        self.export_options = {"compact": compact, "compress": compress, "binary": binary, "cluster": cluster,
+                               "cluster_depth": cluster_depth, "static_layout": static_layout}
+
+        self.G = None
+        self.index = None
+        self.file_imports = {}
+        self.module_files = {}
+        self.snapshot = {}
+
+    def scan(self):
+        snapshot = {}
+        for module_name, file_path in find_python_files(self.codebase_path):
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:  # Deleted while scanning
+                continue
+            snapshot[file_path] = (module_name, stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def start(self):
+        self.snapshot = self.scan()
+        for module_name, file_path, imports in gather_file_imports(self.codebase_path, self.jobs, self.cache_path, self.engine):
+            self.file_imports[file_path] = imports
+            self.module_files.setdefault(module_name, set()).add(file_path)
+
+        self.index = ModuleIndex(self.module_files)
+        self.G = build_import_graph({m: list(self.module_imports(m)) for m in self.module_files})
+        export_import_graph(self.G, self.output_json_path, show=True, **self.export_options)
+
+    def module_imports(self, module_name):
+        return {
+            self.index.resolve(entry, module_name)[0]
+            for file_path in self.module_files.get(module_name, ())
+            for entry in self.file_imports[file_path]
+        }
+
+    def apply(self, snapshot):
+        """ Updates the graph to the given snapshot, returns whether any edge changed. """
+        changed_files = {f for f in snapshot.keys() | self.snapshot.keys() if snapshot.get(f) != self.snapshot.get(f)}
+        affected_modules = set()
+
+        for file_path in changed_files:
+            old, new = self.snapshot.get(file_path), snapshot.get(file_path)
+            previous = self.file_imports.pop(file_path, [])
+            if old is not None:
+                affected_modules.add(old[0])
+                self.module_files[old[0]].discard(file_path)
+
+            if new is not None:
+                try:
+                    imports = extract_imports_from_file(file_path, self.engine)
+                except (OSError, SyntaxError, UnicodeDecodeError) as e:  # Usually a file that is mid edit
+                    print(f"Keeping the previous imports of {file_path}: {e}")
+                    imports = previous
+                affected_modules.add(new[0])
+                self.module_files.setdefault(new[0], set()).add(file_path)
+                self.file_imports[file_path] = imports
+
+        self.snapshot = snapshot
+        for module_name in affected_modules:
+            if not self.module_files.get(module_name):
+                self.module_files.pop(module_name, None)
+
+        # A module appearing or disappearing can change how every other import resolves
+        index = ModuleIndex(self.module_files)
+        if index.modules.keys() != self.index.modules.keys():
+            self.index = index
+            affected_modules.update(self.module_files)
+
+        # The edges into a module are exactly its imports, so diff them against the new imports
+        changed = False
+        for module_name in affected_modules:
+            old_deps = set(self.G.predecessors(module_name)) if module_name in self.G else set()
+            new_deps = self.module_imports(module_name)
+
+            removed = [(dep, module_name) for dep in old_deps - new_deps]
+            added = [(dep, module_name, {"internal": dep in self.module_files}) for dep in new_deps - old_deps]
+            self.G.remove_edges_from(removed)
+            self.G.add_edges_from(added)
+            changed = changed or bool(removed or added)
+
+            # Edges keep their place but flip between internal and external with the modules
+            for dep in old_deps & new_deps:
+                internal = dep in self.module_files
+                if self.G.edges[dep, module_name]["internal"] != internal:
+                    self.G.edges[dep, module_name]["internal"] = internal
+                    changed = True
+
+            # Nodes only exist through their edges
+            for node in {module_name, *(dep for dep, _ in removed)}:
+                if node in self.G and self.G.degree(node) == 0:
+                    self.G.remove_node(node)
+
+        return changed
+
+    def wait_for_changes(self, changes=None):
+        """ Blocks until the codebase changed and then settled for `debounce` seconds, returns the new snapshot. """
+        if changes is None:  # Polling
+            while True:
+                time.sleep(self.interval)
+                snapshot = self.scan()
+                if snapshot != self.snapshot:
+                    break
+            while True:
+                time.sleep(self.debounce)
+                latest = self.scan()
+                if latest == snapshot:
+                    return snapshot
+                snapshot = latest
+
+        changes.wait()
+        changes.clear()
+        while changes.wait(self.debounce):
+            changes.clear()
+        return self.scan()
+
+    def run(self):
+        self.start()
+
+        # Use filesystem notifications (inotify, FSEvents, ...) when watchdog is available, polling otherwise
+        observer = changes = None
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            print(f"Polling {self.codebase_path} for changes every {self.interval}s (install watchdog for notifications)")
+        else:
+            changes = threading.Event()
+
+            class Handler(FileSystemEventHandler):
+                def on_any_event(self, event):
+                    if str(event.src_path).endswith(".py") or str(getattr(event, "dest_path", "")).endswith(".py") or event.is_directory:
+                        changes.set()
+
+            observer = Observer()
+            observer.schedule(Handler(), self.codebase_path, recursive=True)
+            observer.start()
+            print(f"Watching {self.codebase_path} for changes")
+
+        try:
+            while True:
+                snapshot = self.wait_for_changes(changes)
+                if snapshot != self.snapshot and self.apply(snapshot):
+                    export_import_graph(self.G, self.output_json_path, **self.export_options)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
     
-def visualize_graph(G):
+@profiling.profiled()
+def visualize_graph(G, output_path="a.svg", layout="force"):
     plt.figure(figsize=(12, 12))  # Set the figure size
     
-    # Create a layout for the nodes
-    pos = nx.spring_layout(G, k=0.15, iterations=20)
+    # Create a layout for the nodes, see ontology.layouts for the choices
+    pos = LAYOUTS[layout](G)
 
-    # Draw the nodes and edges
-    nx.draw(G, pos, with_labels=True, node_size=3000, node_color='skyblue', 
-            font_size=10, font_weight='bold', edge_color='gray', arrows=True)
+    # Shrink the nodes and drop the labels as the graph grows so the drawing stays legible
+    # Arrows are a matplotlib patch each, past a few hundred edges they cost far more than the layout,
+    # so larger graphs get plain lines drawn as a single LineCollection
+    scale = min(1, 50 / max(len(G), 1))
+    nx.draw(G, pos, with_labels=len(G) <= 500, node_size=max(3000 * scale, 10), node_color='skyblue', 
+            font_size=10 if len(G) <= 100 else 4, font_weight='bold', edge_color='gray',
+            arrows=G.number_of_edges() <= MAX_ARROW_EDGES, width=1 if len(G) <= 100 else 0.2)
     
     # Show the plot
     plt.title("Python Codebase Import Graph", size=15)
-    plt.savefig("a.svg", format='svg', dpi=300)
+    plt.savefig(output_path, format='svg', dpi=300)
     plt.close()
 
 
 if __name__ == "__main__":
-    import sys
-    codebase_path = sys.argv[1]  # Replace with the path to your codebase
-    output_json_path = sys.argv[2]
+    import argparse
+    parser = argparse.ArgumentParser(description="Exports the import graph of a python codebase to json and html.")
+    parser.add_argument("codebase_path", help="Path to the codebase to scan.")
+    parser.add_argument("output_json_path", help="Output path, without the .json/.html extension.")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of processes used to parse files, 0 uses every core (default: 1).")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="Reparse every file instead of reusing <output>.cache.sqlite.")
+    parser.add_argument("--engine", choices=ENGINES, default="toplevel",
+                        help="How imports are extracted, both give the same result (default: toplevel).")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and re-export the json/html whenever the import graph changes.")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="Seconds between polls in watch mode when watchdog isn't installed (default: 1.0).")
+    parser.add_argument("--svg", dest="svg_path", metavar="PATH",
+                        help="Where to draw the graph as an svg (default: <output>.svg).")
+    parser.add_argument("--no-svg", action="store_true", help="Skip drawing the svg.")
+    parser.add_argument("--layout", choices=LAYOUTS, default="force",
+                        help="Layout of the svg: force (Barnes-Hut, scales to large graphs), hierarchical (layered, "
+                             "for mostly acyclic graphs) or spring (networkx, small graphs only) (default: force).")
+    parser.add_argument("--compact", action="store_true", help="Write the json without indentation, one node or link per line.")
+    parser.add_argument("--gzip", dest="compress", action="store_true", help="Write <output>.json.gz instead of <output>.json.")
+    parser.add_argument("--binary", action="store_true", help="Also write <output>.csr, a compact binary graph that loads quickly.")
+    parser.add_argument("--cluster", choices=["module", "community"],
+                        help="Draw the html with the modules collapsed into packages (or communities) that expand on "
+                             "double click, for graphs too large to draw node by node.")
+    parser.add_argument("--cluster-depth", type=int, default=1,
+                        help="With --cluster module, how many parts of the module names make a package (default: 1).")
+    parser.add_argument("--static-layout", action="store_true",
+                        help="Lay the html out beforehand and turn its physics off, so large graphs show up right away. "
+                             "The positions are cached, an unchanged graph reuses them.")
+    parser.add_argument("--analyze", action="store_true",
+                        help="Also write <output>.analysis.json: import cycles, most imported modules and layers.")
+    args = parser.parse_args()
+    svg_path = None if args.no_svg else (args.svg_path or args.output_json_path + ".svg")
 
-    create_import_graph(codebase_path, output_json_path)
\ No newline at end of file
+    if args.watch:
+        ImportGraphWatcher(args.codebase_path, args.output_json_path, jobs=args.jobs, cache=args.cache,
+                           engine=args.engine, interval=args.interval, compact=args.compact, compress=args.compress,
+                           binary=args.binary, cluster=args.cluster, cluster_depth=args.cluster_depth,
+                           static_layout=args.static_layout).run()
+    else:
+        create_import_graph(args.codebase_path, args.output_json_path, jobs=args.jobs, cache=args.cache, engine=args.engine,
+                            svg_path=svg_path, layout=args.layout, compact=args.compact, compress=args.compress,
+                            binary=args.binary, analyze=args.analyze, cluster=args.cluster,
+                            cluster_depth=args.cluster_depth, static_layout=args.static_layout)
@@ -0,0 +1,352 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import resource
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+import app
+from ontology import Ontology, checks, profiling
+from ontology.serializers import write_node_link_json
+
+# Stages of the import graph pipeline, in the order they run
+STAGES = ("walk", "parse", "graph", "json", "html", "svg")
+EXTERNAL_MODULES = ("os", "sys", "json", "re", "typing", "collections", "numpy", "networkx")
+
+# Function to write a synthetic codebase of `modules` modules, each importing about `density` others.
+# Modules are spread over nested packages and use every import form the pipeline handles: absolute,
+# "from" imports of modules and of names, relative imports, external modules and imports nested in functions.
+def generate_codebase(root, modules=1000, density=5, package_size=50, seed=0):
+    rng = random.Random(seed)
+    names = []
+    for i in range(modules):
+        package = i // package_size
+        names.append(f"pkg{package // package_size}.sub{package}.mod{i}")
+
+    packages = {name.rsplit(".", 1)[0] for name in names} | {name.split(".")[0] for name in names}
+    for package in packages:
+        os.makedirs(os.path.join(root, *package.split(".")), exist_ok=True)
+        with open(os.path.join(root, *package.split("."), "__init__.py"), "w") as f:
+            f.write('"""Synthetic package."""\n')
+
+    for i, name in enumerate(names):
+        package = name.rsplit(".", 1)[0]
+        siblings = names[i - i % package_size:i - i % package_size + package_size]
+        lines = ['"""Synthetic module."""', ""]
+        nested = []
+        for _ in range(density):
+            target = rng.choice(siblings if rng.random() < 0.5 else names)
+            form = rng.random()
+            if form < 0.1:
+                nested.append(f"import {target}")
+            elif form < 0.3 and target.rsplit(".", 1)[0] == package:
+                lines.append(f"from . import {target.rsplit('.', 1)[1]}")
+            elif form < 0.6:
+                lines.append(f"from {target} import value")
+            else:
+                lines.append(f"import {target}")
+        lines.append(f"import {rng.choice(EXTERNAL_MODULES)}")
+        lines += ["", f"value = {i}", "", "", "def function():"]
+        lines += [f"    {line}" for line in nested] + [f"    return {i}", ""]
+        with open(os.path.join(root, *name.split(".")) + ".py", "w") as f:
+            f.write("\n".join(lines))
+
+
+# Function to read the peak resident memory of this process and of its finished children, in MiB
+def peak_rss():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    return own / 2 ** 20, children / 2 ** 20
+
+
+# Function to run the pipeline once on a codebase and time every stage, through the functions of app.py
+# and the stages they report to ontology.profiling.
+# It runs in a fresh process (see run_benchmarks) so the peak memory belongs to this run only.
+def run_pipeline(codebase_path, output_path, engine="toplevel", jobs=1, stages=STAGES, layout="force"):
+    with profiling.profile(sink=lambda report: None) as profiler:
+        imports_graph = app.gather_imports_from_codebase(codebase_path, jobs, engine=engine)
+        G = app.build_import_graph(imports_graph)
+
+        # The two halves of app.export_import_graph, timed apart so either can be skipped
+        if "json" in stages:
+            with profiling.stage("json"):
+                write_node_link_json(G, output_path + ".json")
+        if "html" in stages:
+            with profiling.stage("html"):
+                Ontology(G).create_visualization(output_path + ".html", show=False)
+        if "svg" in stages:
+            app.visualize_graph(G, output_path + ".svg", layout)
+
+    wall = {name: stats["wall"] for name, stats in profiler.stages.items()}
+    timings = {
+        "walk": wall["gather_file_imports.walk"],
+        "parse": wall["gather_file_imports.parse"],
+        "graph": wall["gather_imports_from_codebase.resolve"] + wall["build_import_graph"],
+        **{stage: wall[stage] for stage in ("json", "html") if stage in stages},
+        **({"svg": wall["visualize_graph"]} if "svg" in stages else {}),
+    }
+
+    rss, children_rss = peak_rss()
+    return {
+        "files": len(imports_graph),
+        "nodes": G.number_of_nodes(),
+        "edges": G.number_of_edges(),
+        "stages": timings,
+        "total": sum(timings.values()),
+        "peak_rss_mb": round(rss, 1),
+        "peak_children_rss_mb": round(children_rss, 1),
+        # Edges in a stable order, only used for the engine parity check
+        "graph": sorted(G.edges()),
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+# Function to benchmark every combination of size and engine, each run in its own process
+def run_benchmarks(sizes, density=5, engines=app.ENGINES, jobs=1, stages=STAGES, repeat=1, layout="force",
+                   workdir=None, seed=0):
+    results = []
+    root = workdir or tempfile.mkdtemp(prefix="import-graph-bench-")
+    try:
+        for modules in sizes:
+            codebase_path = os.path.join(root, f"codebase-{modules}-{density}-{seed}")
+            if not os.path.isdir(codebase_path):
+                start = time.perf_counter()
+                generate_codebase(codebase_path, modules, density, seed=seed)
+                print(f"Generated {modules} modules in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+            graphs = {}
+            for engine in engines:
+                for run in range(repeat):
+                    with ProcessPoolExecutor(max_workers=1) as executor:
+                        result = executor.submit(run_pipeline, codebase_path, os.path.join(root, f"output-{modules}"),
+                                                 engine, jobs, stages, layout).result()
+                    graphs[engine] = result.pop("graph")
+                    result.update({"modules": modules, "density": density, "engine": engine, "jobs": jobs, "run": run})
+                    results.append(result)
+                    print(format_result(result), file=sys.stderr)
+
+            # Every engine must produce the same graph
+            reference = graphs[engines[0]]
+            for result in results:
+                if result["modules"] == modules:
+                    result["parity"] = graphs[result["engine"]] == reference
+    finally:
+        if workdir is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    return results
+
+
+# Sources where the toplevel engine has to notice that it can't be trusted, or must read imports spread over lines
+PARITY_FIXTURES = {
+    "strings.py": 'import os\nx = "import sys"\ns = """\nimport fake\n"""\n',
+    "comments.py": "# import this\nimport os\n",
+    "docstring.py": '"""Mentions\nimport nothing\n"""\nimport os\n',
+    "parenthesized.py": "from a import (\n    b,\n    c,\n)\nvalue = 1\n",
+    "nested.py": "import os\n\n\ndef f():\n    import json\n    return json\n",
+    "conditional.py": "import os\nif os.name:\n    import sys\n",
+    "fallback.py": "try:\n    import ujson as json\nexcept ImportError:\n    import json\n",
+    "class_body.py": "import os, sys\n\n\nclass A:\n    from typing import List\n",
+    "semicolon.py": "x = 1; import os\n",
+    "relative.py": "from __future__ import annotations\nfrom . import x\nfrom ..pkg import y as z\nimport a.b.c\n",
+    "empty.py": "",
+}
+
+
+# Function to write the corpus --parity checks by default: a synthetic codebase and PARITY_FIXTURES
+def write_parity_corpus(root, modules=500, seed=0):
+    generate_codebase(os.path.join(root, "synthetic"), modules, seed=seed)
+    os.makedirs(os.path.join(root, "fixtures"), exist_ok=True)
+    for name, source in PARITY_FIXTURES.items():
+        with open(os.path.join(root, "fixtures", name), "w") as f:
+            f.write(source)
+
+
+# Function to parse the assertions of a class from the str() of its equivalent_to clauses, the way
+# the converters used to. Kept as the reference for benchmark_assertions.
+def string_assertions(cls):
+    assertions = []
+    for clause in cls.equivalent_to:
+        assertion, target = str(clause).split('&')[1].strip()[:-1].split('(')
+        relationship, cardinality = assertion.rsplit('.', 1)
+        if ',' in target:
+            cardinality += " " + target.split(',')[0].strip()
+            target = target.split(',')[1].strip()
+        assertions.append((relationship, cardinality, target))
+    return assertions
+
+
+# Function to time reading the assertions of every class of an ontology, from strings and with ontology.restrictions
+def benchmark_assertions(ontology_path, repeat=3):
+    from owlready2 import World, And
+    from ontology.restrictions import assertions
+
+    classes = list(World().get_ontology(str(ontology_path)).load().classes())
+    timings = {}
+    for name, parse in (("string", string_assertions), ("walker", assertions)):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for cls in classes:
+                try:
+                    parse(cls)
+                except (ValueError, IndexError):
+                    pass
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+
+    # Both must agree on the clauses the string parsing understands: a class and a single restriction
+    mismatches = failures = extra = 0
+    for cls in classes:
+        walked = [(str(prop), cardinality, target) for prop, cardinality, target in assertions(cls)]
+        try:
+            parsed = string_assertions(cls)
+        except (ValueError, IndexError):
+            failures += 1
+            continue
+        simple = all(isinstance(clause, And) and len(clause.Classes) == 2 for clause in cls.equivalent_to)
+        if simple and walked != parsed:
+            mismatches += 1
+        extra += max(0, len(walked) - len(parsed))
+
+    return {
+        "ontology": str(ontology_path),
+        "classes": len(classes),
+        "clauses": sum(len(cls.equivalent_to) for cls in classes),
+        "stages": timings,
+        "speedup": timings["string"] / max(timings["walker"], 1e-9),
+        "mismatches": mismatches,
+        "string_failures": failures,
+        "extra_assertions": extra,
+    }
+
+
+# Function to run ontology.checks.check_lazy on an ontology file
+def check_lazy(ontology_path, count=20, output_path=None):
+    from owlready2 import World
+    result = checks.check_lazy(World().get_ontology(str(ontology_path)).load(), count, output_path)
+    return {"ontology": str(ontology_path), **result}
+
+
+def format_result(result, baseline=None):
+    stages = []
+    for stage, seconds in result["stages"].items():
+        text = f"{stage} {seconds:.3f}s"
+        if baseline and stage in baseline["stages"] and baseline["stages"][stage] > 0:
+            text += f" ({(seconds / baseline['stages'][stage] - 1) * 100:+.0f}%)"
+        stages.append(text)
+    return (f"{result['modules']} modules, {result['engine']}, jobs={result['jobs']}: " + ", ".join(stages) +
+            f", total {result['total']:.3f}s, peak rss {result['peak_rss_mb']} MiB")
+
+
+# Function to print each result next to the matching result of an earlier benchmark
+def compare(results, baseline_results):
+    baseline = {(r["modules"], r["density"], r["engine"], r["run"]): r for r in baseline_results}
+    for result in results:
+        key = (result["modules"], result["density"], result["engine"], result["run"])
+        print(format_result(result, baseline.get(key)))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmarks the import graph pipeline of app.py on synthetic codebases.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="Number of modules of each synthetic codebase (default: 1000 10000 50000).")
+    parser.add_argument("--density", type=int, default=5, help="Imports per module (default: 5).")
+    parser.add_argument("--engines", nargs="+", choices=app.ENGINES, default=list(app.ENGINES),
+                        help="Import extraction engines to compare (default: all).")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Processes used to parse files, 0 uses every core (default: 1).")
+    parser.add_argument("--skip", nargs="+", choices=("json", "html", "svg"), default=[],
+                        help="Stages to leave out, eg: --skip html svg for the largest sizes.")
+    parser.add_argument("--layout", choices=app.LAYOUTS, default="force", help="Layout of the svg stage (default: force).")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of each combination (default: 1).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic codebases (default: 0).")
+    parser.add_argument("--workdir", help="Keep the generated codebases and outputs here, and reuse them on the next run.")
+    parser.add_argument("--output", help="Write the results as json to this file, - for stdout.")
+    parser.add_argument("--baseline", help="Results json of an earlier run to compare against.")
+    parser.add_argument("--assertions", metavar="OWL",
+                        help="Instead, time reading the assertions of this ontology from strings against ontology.restrictions.")
+    parser.add_argument("--lazy", metavar="OWL",
+                        help="Instead, write the documentation and visualization of some subclasses of this ontology with "
+                             "LazyOntology, checking their nodes against the full graph. Exits with an error on any mismatch.")
+    parser.add_argument("--parity", metavar="DIR", nargs="?", const="",
+                        help="Instead, check that the engines extract the same imports from every python file of DIR, "
+                             "eg: the standard library, or of a synthetic codebase and tricky sources when DIR is left "
+                             "out. Exits with an error on any mismatch.")
+    args = parser.parse_args()
+
+    if args.assertions:
+        result = benchmark_assertions(args.assertions, max(args.repeat, 3))
+        print(f"{result['classes']} classes, {result['clauses']} equivalent_to clauses: string {result['stages']['string']:.3f}s, "
+              f"walker {result['stages']['walker']:.3f}s ({result['speedup']:.1f}x), {result['mismatches']} mismatches, "
+              f"{result['string_failures']} classes the string parsing fails on, {result['extra_assertions']} more assertions found",
+              file=sys.stderr)
+        if args.output:
+            with open(args.output, "w") if args.output != "-" else sys.stdout as f:
+                json.dump({"environment": environment(), "assertions": result}, f, indent=4)
+        sys.exit(1 if result["mismatches"] else 0)
+
+    if args.lazy:
+        result = check_lazy(args.lazy, output_path=args.workdir)
+        checks.report_lazy(result)
+        if args.output:
+            with open(args.output, "w") if args.output != "-" else sys.stdout as f:
+                json.dump({"environment": environment(), "lazy": result}, f, indent=4)
+        sys.exit(1 if result["mismatches"] else 0)
+
+    if args.parity is not None:
+        corpus = args.parity or tempfile.mkdtemp(prefix="import-graph-parity-")
+        try:
+            if not args.parity:
+                write_parity_corpus(corpus, seed=args.seed)
+            result = app.check_engine_parity(corpus, args.engines, args.jobs)
+        finally:
+            if not args.parity:
+                shutil.rmtree(corpus, ignore_errors=True)
+        for mismatch in result["mismatches"][:20]:
+            print(f"{mismatch['file']}: {mismatch['engine']} differs from walk", file=sys.stderr)
+        print(f"{result['files']} files ({result['unparsable']} unparsable), {len(result['mismatches'])} mismatches: " +
+              ", ".join(f"{engine} {seconds:.3f}s" for engine, seconds in result["stages"].items()), file=sys.stderr)
+        if args.output:
+            with open(args.output, "w") if args.output != "-" else sys.stdout as f:
+                json.dump({"environment": environment(), "parity": result}, f, indent=4)
+        sys.exit(1 if result["mismatches"] else 0)
+
+    stages = [stage for stage in STAGES if stage not in args.skip]
+    results = run_benchmarks(args.sizes, args.density, args.engines, args.jobs, stages, args.repeat, args.layout,
+                             args.workdir, args.seed)
+    report = {"environment": environment(), "results": results}
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f)["results"])
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=4)
+    elif args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+    if not all(result["parity"] for result in results):
+        sys.exit("The engines produced different import graphs")
@@ -3,24 +3,146 @@
 """
 import ontology.loaders as loaders
 import ontology.webpages as webpages
+import ontology.serializers as serializers
+import ontology.cache as cache
+import ontology.diff as diff
+import ontology.profiling as profiling
+import owlready2
+import networkx as nx
 
 class Ontology:
 	@staticmethod
-	def from_owl_file(ontology_file):
-		entities, relationships, datatypes = loaders.owl_to_json(ontology_file)
+	def from_owl_file(ontology_file, use_cache: bool=True, lazy: bool=False, profile=None):
+		""" use_cache reuses the json of a previous load of the same file content, see ontology.cache.
+			lazy returns a LazyOntology, which converts entities only when they are used.
+			profile reports the time of each loading stage to a sink ("log", a json path or a callable), see ontology.profiling.
+		"""
+		if profile is not None:
+			with profiling.profile(profile):
+				return Ontology.from_owl_file(ontology_file, use_cache, lazy)
+		if lazy:
+			return LazyOntology(owlready2.get_ontology(str(ontology_file)).load())
+		if use_cache:
+			entities, relationships, datatypes = cache.load(ontology_file, loaders.owl_to_json)
+		else:
+			entities, relationships, datatypes = loaders.owl_to_json(ontology_file)
 		return Ontology.from_json(entities, relationships, datatypes)
 
+	@staticmethod
+	def from_owl_files(ontology_files, use_cache: bool=True, jobs: int=0):
+		""" Returns an Ontology per file, loading the files concurrently in jobs processes (0 uses every core). """
+		if use_cache:
+			loaded = cache.load_many(ontology_files, loaders.owl_to_json, jobs)
+		else:
+			loaded = loaders.owl_files_to_json(ontology_files, jobs)
+		return [Ontology.from_json(*json) for json in loaded]
+
 	@staticmethod
 	def from_json(entities, relationships, datatypes):
-		return Ontology(loaders.json_to_graph(entities, relationships, datatypes))
+		# The html titles are only written when they are needed, see create_visualization()
+		return Ontology(loaders.json_to_graph(entities, relationships, datatypes, lazy_titles=True))
+
+	@staticmethod
+	def from_binary_file(graph_file):
+		""" Loads a graph saved with save_binary(), much faster than parsing the ontology or a json export. """
+		return Ontology(serializers.read_graph_binary(graph_file))
 
 	def __init__(self, graph):
 		assert not isinstance(graph, str), "A string was passed to the constructor, did you mean '.from_owl_file()'?"
 		self.graph = graph
 
-	def create_visualization(self, write_path="ontology_visualizer.html", show=False):
-		webpages.OntologyVisualizer().create_html(self.graph, write_path, show)
+	def save_binary(self, write_path="ontology.csr"):
+		return serializers.write_graph_binary(loaders.add_titles(self.graph), write_path)
+
+	def update(self, old_json, new_json):
+		""" Applies the changes between two (entities, relations, datatypes) snapshots to the graph in place and
+			returns them, see ontology.diff. The graph must have been built from old_json.
+		"""
+		return diff.apply(self.graph, old_json, new_json)
+
+	def create_visualization(self, write_path="ontology_visualizer.html", show=False, cluster=None, static_layout=False, **cluster_options):
+		""" cluster draws a level of detail view for large graphs, clustered by "module", "ancestor" or
+			"community" with cluster_options (eg: depth=2), see webpages.ClusteredVisualizer. static_layout
+			lays the graph out beforehand and turns the physics off, see webpages.OntologyVisualizer.
+		"""
+		if cluster is None:
+			visualizer = webpages.OntologyVisualizer(static_layout=static_layout)
+		else:
+			visualizer = webpages.ClusteredVisualizer(cluster, static_layout=static_layout, **cluster_options)
+		visualizer.create_html(loaders.add_titles(self.graph), write_path, show)
+
+	def create_documentation(self, write_path="ontology_documentation.html", show=False, title="Ontology Documentation", split=False):
+		""" split writes a page per module and makes write_path their index, see OntologyDocumentation.create_html. """
+		webpages.OntologyDocumentation(title).create_html(self.graph, write_path, show, split)
+
+
+
+class LazyOntology(Ontology):
+	""" Keeps the loaded owlready2 ontology and converts entities to json only when they are first used.
+
+		The graph is only built for the entities that are visualized, see subgraph().
+	"""
+	def __init__(self, owl_ontology):
+		self.index = loaders.OntologyIndex(owl_ontology)
+		self._graph = None
+		self._partial = nx.Graph()
+		self._loaded = set()
+
+	def entity_names(self):
+		return list(self.index.classes)
+
+	def entity(self, name):
+		""" Returns the json of an entity, as in the entities of loaders.owl_to_json. """
+		return self.index.entity(name)
+
+	def relation(self, name):
+		return self.index.relation(name)
+
+	@property
+	def datatypes(self):
+		return self.index.datatypes()
+
+	def to_json(self):
+		return self.index.to_json()
+
+	@property
+	def graph(self):
+		""" The graph of the whole ontology, built on first use. """
+		if self._graph is None:
+			self._graph = loaders.json_to_graph(*self.index.to_json(), lazy_titles=True)
+		return self._graph
+
+	def subgraph(self, names):
+		""" Returns the graph of the named entities and their neighbours.
+
+			The neighbours that are entities (eg: ancestors, assertion targets) are converted too, so they
+			are drawn and documented like the named ones. Only entities that weren't converted before are
+			added, so repeated calls grow one graph incrementally.
+		"""
+		names = list(dict.fromkeys(names))
+		self._load(names)
+		self._load([n for name in names for n in self._partial.adj[name] if n in self.index])
+
+		nodes = set(names)
+		for name in names:
+			nodes.update(self._partial.adj[name])
+		return self._partial.subgraph(nodes)
+
+	def _load(self, names):
+		new = [name for name in dict.fromkeys(names) if name not in self._loaded]
+		if new:
+			self._partial.update(loaders.json_to_graph(*self.index.to_json(new)))
+			self._loaded.update(new)
 
-	def create_documentation(self, write_path="ontology_documentation.html", show=False, title="Ontology Documentation"):
-		webpages.OntologyDocumentation(title).create_html(self.graph, write_path, show)
+	def create_visualization(self, write_path="ontology_visualizer.html", show=False, entities=None, cluster=None, static_layout=False, **cluster_options):
+		""" entities limits the visualization to those entities and their neighbours. """
+		graph = loaders.add_titles(self.graph) if entities is None else self.subgraph(entities)
+		if cluster is None:
+			visualizer = webpages.OntologyVisualizer(static_layout=static_layout)
+		else:
+			visualizer = webpages.ClusteredVisualizer(cluster, static_layout=static_layout, **cluster_options)
+		visualizer.create_html(graph, write_path, show)
 
+	def create_documentation(self, write_path="ontology_documentation.html", show=False, title="Ontology Documentation", entities=None, split=False):
+		graph = self.graph if entities is None else self.subgraph(entities)
+		webpages.OntologyDocumentation(title).create_html(graph, write_path, show, split)
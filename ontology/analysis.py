@@ -0,0 +1,177 @@
+""" Structural analysis of large directed graphs on integer arrays.
+
+	The algorithms work on the compressed sparse rows of a CSRGraph (see ontology.serializers), node i's
+	successors being indices[indptr[i]:indptr[i + 1]], which avoids networkx's dict-of-dict traversal.
+"""
+
+import time
+import numpy as np
+from ontology.serializers import CSRGraph
+
+
+def strongly_connected_components(indptr, indices):
+	""" Tarjan's algorithm, iterative so deep graphs don't hit the recursion limit.
+
+		Returns (component of every node, number of components). Components are numbered in reverse
+		topological order: an edge between two components always goes from the higher to the lower number.
+	"""
+	n = len(indptr) - 1
+	indptr, indices = np.asarray(indptr).tolist(), np.asarray(indices).tolist()
+	index = [-1] * n
+	low = [0] * n
+	on_stack = [False] * n
+	component = [-1] * n
+	stack = []
+	counter = count = 0
+
+	for root in range(n):
+		if index[root] != -1:
+			continue
+
+		index[root] = low[root] = counter
+		counter += 1
+		stack.append(root)
+		on_stack[root] = True
+		work = [(root, indptr[root])]  # (node, position in its successors)
+		while work:
+			v, i = work[-1]
+			end = indptr[v + 1]
+			while i < end:
+				w = indices[i]
+				i += 1
+				if index[w] == -1:  # Descend into w, resume v at i afterwards
+					work[-1] = (v, i)
+					index[w] = low[w] = counter
+					counter += 1
+					stack.append(w)
+					on_stack[w] = True
+					work.append((w, indptr[w]))
+					break
+				elif on_stack[w] and index[w] < low[v]:
+					low[v] = index[w]
+			else:
+				# Every successor of v is done
+				work.pop()
+				if low[v] == index[v]:
+					while True:
+						w = stack.pop()
+						on_stack[w] = False
+						component[w] = count
+						if w == v:
+							break
+					count += 1
+				if work and low[v] < low[work[-1][0]]:
+					low[work[-1][0]] = low[v]
+
+	return np.array(component, dtype=np.int64), count
+
+
+def topological_layers(indptr, indices, components, count):
+	""" Returns the layer of every node: 0 for nodes without predecessors, otherwise one more than the
+		deepest predecessor. The nodes of a cycle share a layer.
+
+		Tarjan's numbering is already a reverse topological order of the components, so a single pass from
+		the highest component down settles every layer, however deep the graph is.
+	"""
+	indptr, indices = np.asarray(indptr), np.asarray(indices)
+	sources = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+	# The edges between components, without duplicates, grouped by source component
+	source_components, target_components = components[sources], components[indices]
+	between = source_components != target_components
+	pairs = np.unique(source_components[between] * count + target_components[between])
+	starts = np.zeros(count + 1, dtype=np.int64)
+	np.cumsum(np.bincount(pairs // count, minlength=count), out=starts[1:])
+	starts, targets = starts.tolist(), (pairs % count).tolist()
+
+	layer = [0] * count
+	for c in range(count - 1, -1, -1):
+		next_layer = layer[c] + 1
+		for d in targets[starts[c]:starts[c + 1]]:
+			if layer[d] < next_layer:
+				layer[d] = next_layer
+
+	return np.array(layer, dtype=np.int64)[components]
+
+
+def shortest_cycle(indptr, indices, components, start):
+	""" Returns the shortest cycle through start that stays in its component, as a list ending with start. """
+	parents = {start: None}
+	queue = [start]
+	for v in queue:
+		for w in np.asarray(indices[indptr[v]:indptr[v + 1]]).tolist():
+			if w == start:
+				path = [v]
+				while parents[path[-1]] is not None:
+					path.append(parents[path[-1]])
+				return path[::-1] + [start]
+			if w not in parents and components[w] == components[start]:
+				parents[w] = v
+				queue.append(w)
+	return []
+
+
+def top(values, count):
+	""" Returns the indices of the `count` largest values, largest first. """
+	count = min(count, len(values))
+	if count == 0:
+		return np.array([], dtype=np.int64)
+	candidates = np.argpartition(-values, count - 1)[:count]
+	return candidates[np.lexsort((candidates, -values[candidates]))]
+
+
+def analyze(graph, top_count: int=20):
+	""" Finds the cycles, strongly connected components, highest degree nodes and topological layers of a
+		directed networkx graph or CSRGraph. Returns a json friendly report including the time of each stage.
+	"""
+	timings = {}
+	def timed(stage, function, *args):
+		start = time.perf_counter()
+		result = function(*args)
+		timings[stage] = time.perf_counter() - start
+		return result
+
+	csr = graph if isinstance(graph, CSRGraph) else timed("arrays", CSRGraph.from_networkx, graph, False)
+	names = csr.nodes()
+	indptr, indices = np.asarray(csr.indptr), np.asarray(csr.indices)
+
+	out_degree, in_degree = timed("degrees", lambda: (np.diff(indptr), np.bincount(indices, minlength=len(names))))
+	components, count = timed("strongly_connected_components", strongly_connected_components, indptr, indices)
+
+	def find_cycles():
+		sizes = np.bincount(components, minlength=count)
+		self_loops = np.unique(indices[indices == np.repeat(np.arange(len(names)), np.diff(indptr))])
+		cyclic = np.union1d(np.flatnonzero(sizes > 1), components[self_loops])
+		members = {int(c): [] for c in cyclic}
+		for node in np.flatnonzero(np.isin(components, cyclic)).tolist():
+			members[int(components[node])].append(node)
+		cycles = []
+		for nodes in sorted(members.values(), key=len, reverse=True):
+			start = min(nodes, key=lambda node: names[node])
+			cycles.append({
+				"size": len(nodes),
+				"nodes": sorted(names[node] for node in nodes),
+				"example": [names[node] for node in shortest_cycle(indptr, indices, components, start)],
+			})
+		return cycles
+	cycles = timed("cycles", find_cycles)
+
+	layers = timed("layers", topological_layers, indptr, indices, components, count)
+
+	def ranking(degree):
+		return [{"node": names[i], "count": int(degree[i])} for i in top(degree, top_count).tolist()]
+
+	layered = [[] for _ in range(int(layers.max()) + 1 if len(layers) else 0)]
+	for node, layer in zip(names, layers.tolist()):
+		layered[layer].append(node)
+
+	return {
+		"nodes": len(names),
+		"edges": int(len(indices)),
+		"strongly_connected_components": count,
+		"cycles": cycles,
+		"out_degree": ranking(out_degree),
+		"in_degree": ranking(in_degree),
+		"layers": layered,
+		"timings": timings,
+	}
@@ -0,0 +1,194 @@
+""" Caches the json representation of ontologies so each .owl file is only parsed once, and the layouts of graphs.
+
+	Entries are keyed on the content of the file, so editing the ontology invalidates them. They are kept
+	in memory (least recently used are dropped first) and pickled on disk, which survives restarts.
+	The returned (entities, relations, datatypes) are shared between callers, treat them as read only.
+"""
+
+import os
+import pickle
+import hashlib
+import tempfile
+from pathlib import Path
+from functools import partial
+from collections import OrderedDict
+import ontology
+from ontology import profiling
+from ontology.layouts import force_layout
+
+
+class PickleCache:
+	""" Keeps the latest entries in memory, least recently used are dropped first, and pickles them in directory.
+
+		Each pickle holds VERSION and the key of its entry, pickles of another version or key are ignored.
+	"""
+	VERSION = 1
+
+	def __init__(self, directory=None, size: int=8):
+		""" directory is where the pickles are stored, None keeps the cache in memory only. """
+		self.directory = Path(directory) if directory is not None else None
+		self.size = size
+		self.entries = OrderedDict()
+
+	def remember(self, key, value):
+		""" Keeps value in memory as the most recently used entry, then drops the oldest past size. """
+		self.entries[key] = value
+		self.entries.move_to_end(key)
+		while len(self.entries) > self.size:
+			self.entries.popitem(last=False)
+		return value
+
+	def clear(self):
+		""" Empties the memory, the pickles on disk are kept. """
+		self.entries.clear()
+
+	def read(self, path, key):
+		if self.directory is None:
+			return None
+		entry = read_pickle(path)
+		if isinstance(entry, tuple) and len(entry) == 3 and entry[:2] == (self.VERSION, key):
+			return entry[2]
+		return None
+
+	def write(self, path, key, value):
+		if self.directory is not None:
+			write_pickle(path, (self.VERSION, key, value))
+
+
+class OntologyCache(PickleCache):
+	# Bump this whenever the json format changes, it ignores older pickles.
+	VERSION = 1
+
+	def __init__(self, directory=None, size: int=8):
+		super().__init__(directory, size)
+		self.digests = {}  # (path, mtime, size) -> digest, so unchanged files aren't hashed again
+
+	def digest(self, ontology_path):
+		stat = os.stat(ontology_path)
+		key = (os.path.abspath(ontology_path), stat.st_mtime_ns, stat.st_size)
+		if key not in self.digests:
+			h = hashlib.blake2b(digest_size=16)
+			with open(ontology_path, "rb") as f:
+				for chunk in iter(lambda: f.read(1 << 20), b""):
+					h.update(chunk)
+			self.digests[key] = h.hexdigest()
+		return self.digests[key]
+
+	def load(self, ontology_path, loader):
+		""" Returns loader(ontology_path), from the cache when the file's content was already loaded. """
+		return self.load_many([ontology_path], loader, jobs=1, load_many=lambda paths: [loader(path) for path in paths])[0]
+
+	@profiling.profiled()
+	def load_many(self, ontology_paths, loader, jobs: int=0, load_many=None):
+		""" Returns [loader(path) for path in ontology_paths], only loading the files that aren't cached.
+
+			By default the missing ontologies are loaded concurrently, see loaders.owl_files_to_json.
+		"""
+		name = f"{loader.__module__}.{loader.__qualname__}"
+		keys = [(self.digest(path), name) for path in ontology_paths]
+		results = [self.entries.get(key) or self.read(self._path(path, key), key[0]) for path, key in zip(ontology_paths, keys)]
+
+		missing = [i for i, result in enumerate(results) if result is None]
+		if missing:
+			if load_many is None:
+				load_many = partial(ontology.loaders.owl_files_to_json, jobs=jobs, loader=loader)
+			for i, result in zip(missing, load_many([ontology_paths[i] for i in missing])):
+				self.write(self._path(ontology_paths[i], keys[i]), keys[i][0], result)
+				results[i] = result
+
+		for key, result in zip(keys, results):
+			self.remember(key, result)
+		return results
+
+	def clear(self):
+		""" Empties the memory, the pickles on disk are kept. """
+		super().clear()
+		self.digests.clear()
+
+	def _path(self, ontology_path, key):
+		# One pickle per file and loader, the digest tells whether it is stale
+		if self.directory is None:
+			return None
+		source = hashlib.blake2b(f"{os.path.abspath(ontology_path)}|{key[1]}".encode(), digest_size=8).hexdigest()
+		return self.directory / f"{Path(ontology_path).stem}-{source}.pickle"
+
+
+class LayoutCache(PickleCache):
+	""" Caches the node positions of layouts (see ontology.layouts) by the structure of the graph, so an
+		unchanged graph isn't laid out again. Attributes don't change the layout, they aren't part of the key.
+	"""
+	VERSION = 2
+
+	@staticmethod
+	def digest(graph):
+		""" Hash of the nodes and edges, independent of their order. """
+		h = hashlib.blake2b(digest_size=16)
+		h.update(repr(graph.is_directed()).encode())
+		for node in sorted(map(repr, graph)):
+			h.update(node.encode() + b"\0")
+		h.update(b"\1")
+		edges = ((repr(u), repr(v)) for u, v in graph.edges())
+		if not graph.is_directed():
+			edges = (tuple(sorted(edge)) for edge in edges)
+		for u, v in sorted(edges):
+			h.update(u.encode() + b"\0" + v.encode() + b"\0")
+		return h.hexdigest()
+
+	def layout(self, graph, layout=force_layout, **options):
+		""" Returns layout(graph, **options), from the cache when the graph was already laid out. """
+		name = f"{layout.__module__}.{layout.__qualname__}"
+		key = hashlib.blake2b(f"{self.digest(graph)}|{name}|{sorted(options.items())!r}".encode(), digest_size=16).hexdigest()
+		path = self.directory / f"{key}.pickle" if self.directory is not None else None
+
+		positions = self.entries.get(key)
+		if positions is None:
+			positions = self.read(path, key)
+		if positions is None:
+			positions = layout(graph, **options)
+			self.write(path, key, positions)
+		return self.remember(key, positions)
+
+
+def read_pickle(path):
+	""" Returns the unpickled content of path, None if it is missing or unreadable. """
+	try:
+		with open(path, "rb") as f:
+			return pickle.load(f)
+	except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError, AttributeError, ImportError):
+		return None
+
+
+def write_pickle(path, obj):
+	""" Pickles obj to path, a failure only costs the disk cache so it isn't raised. """
+	try:
+		path.parent.mkdir(parents=True, exist_ok=True)
+		fd, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+	except OSError:
+		return
+
+	# Write to a temporary file first so a crash or another process never sees half a pickle
+	try:
+		with os.fdopen(fd, "wb") as f:
+			pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(temporary, path)
+	except (OSError, pickle.PicklingError, RecursionError, TypeError):
+		os.unlink(temporary)
+
+
+def default_directory():
+	return Path(os.environ.get("ONTOLOGY_CACHE_DIR") or Path.home() / ".cache" / "ontology")
+
+
+# Shared by Ontology.from_owl_file and ClassFactory.get_ontology
+default_cache = OntologyCache(default_directory())
+default_layouts = LayoutCache(default_directory() / "layouts")
+
+
+def load(ontology_path, loader):
+	""" Returns loader(ontology_path) through the default cache. """
+	return default_cache.load(ontology_path, loader)
+
+
+def load_many(ontology_paths, loader, jobs: int=0):
+	""" Returns [loader(path) for path in ontology_paths] through the default cache, loading them concurrently. """
+	return default_cache.load_many(ontology_paths, loader, jobs)
@@ -0,0 +1,104 @@
+""" Consistency checks of the optimized code paths against the straightforward ones they replace.
+
+	python -m ontology.checks runs them on a small ontology built here, so they need no files. Changes to
+	LazyOntology must pass them, benchmark.py --lazy runs the same check on a real ontology.
+"""
+
+import os
+import sys
+import time
+import shutil
+import types
+import tempfile
+import owlready2
+from owlready2 import Thing, ObjectProperty, DataProperty, AnnotationProperty
+
+
+def sample_ontology():
+	""" A small ontology in its own world, with the shapes the loaders handle: a hierarchy, assertions,
+		object properties and data properties shared by several classes.
+	"""
+	world = owlready2.World()
+	onto = world.get_ontology("http://example.org/sample.owl")
+	with onto:
+		class definition(AnnotationProperty): pass
+		party = types.new_class("Party", (Thing,))
+		customer = types.new_class("Customer", (party,))
+		broker = types.new_class("Broker", (party,))
+		product = types.new_class("Product", (Thing,))
+		policy = types.new_class("Policy", (product,))
+		claim = types.new_class("Claim", (Thing,))
+		evidence = types.new_class("ClaimEvidence", (claim,))
+		vip = types.new_class("VIPCustomer", (customer,))
+		customer.definition = ["Someone who buys a product"]
+
+		owns = types.new_class("owns", (ObjectProperty,))
+		owns.domain, owns.range = [customer], [product]
+		sells = types.new_class("sells", (ObjectProperty,))
+		sells.domain, sells.range = [broker], [policy]
+		supports = types.new_class("supports", (ObjectProperty,))
+		supports.domain, supports.range = [evidence], [claim]
+		name = types.new_class("name", (DataProperty,))
+		name.domain, name.range = [party, product], [str]
+		amount = types.new_class("amount", (DataProperty,))
+		amount.domain, amount.range = [claim], [float]
+		amount.definition = ["The amount claimed #important"]
+
+		customer.equivalent_to.append(party & owns.some(policy))
+		vip.equivalent_to.append(customer & owns.min(2, policy))
+		evidence.equivalent_to.append(claim & supports.exactly(1, claim))
+	return onto
+
+
+def check_lazy(owl_ontology=None, count: int=20, output_path=None):
+	""" Writes the documentation and visualization of some subclasses with LazyOntology(entities=[subclass]),
+		and checks the nodes and edges of their subgraphs against the graph of the whole ontology.
+
+		The check passes when the returned mismatches are empty. The pages are written to output_path, a
+		temporary directory by default.
+	"""
+	from ontology import LazyOntology, loaders
+
+	owl_ontology = owl_ontology if owl_ontology is not None else sample_ontology()
+	full = loaders.json_to_graph(*LazyOntology(owl_ontology).to_json())
+	subclasses = [name for name, data in full.nodes(data=True) if data.get("type") == "entity" and data["ancestors"]]
+	sample = subclasses[::max(1, len(subclasses) // count)][:count]
+
+	root = output_path or tempfile.mkdtemp(prefix="lazy-ontology-")
+	lazy = LazyOntology(owl_ontology)
+	mismatches = []
+	start = time.perf_counter()
+	try:
+		for name in sample:
+			graph = lazy.subgraph([name])
+			for node, data in graph.nodes(data=True):
+				if node not in full or data != full.nodes[node]:
+					mismatches.append({"entity": name, "node": node})
+			for u, v in graph.edges():
+				if not full.has_edge(u, v):
+					mismatches.append({"entity": name, "edge": [u, v]})
+			lazy.create_documentation(os.path.join(root, "documentation.html"), entities=[name])
+			lazy.create_visualization(os.path.join(root, "visualization.html"), entities=[name])
+	finally:
+		if output_path is None:
+			shutil.rmtree(root, ignore_errors=True)
+
+	return {
+		"entities": full.number_of_nodes(),
+		"subclasses": len(sample),
+		"stages": {"lazy": time.perf_counter() - start},
+		"mismatches": mismatches,
+	}
+
+
+def report_lazy(result):
+	for mismatch in result["mismatches"][:20]:
+		print(f"{mismatch['entity']}: {mismatch.get('node') or mismatch.get('edge')} differs from the full graph", file=sys.stderr)
+	print(f"{result['subclasses']} subclasses documented and visualized in {result['stages']['lazy']:.3f}s, "
+		f"{len(result['mismatches'])} mismatches", file=sys.stderr)
+
+
+if __name__ == "__main__":
+	result = check_lazy()
+	report_lazy(result)
+	sys.exit(1 if result["mismatches"] else 0)
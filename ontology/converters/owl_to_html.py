@@ -2,17 +2,8 @@
 	Select all options (eg: annotations) then run this file.
 """
 from owlready2 import *
-
-def get_ranks(start):
-	ranks = {}
-	def get_next_level(cls, level):
-		ranks[cls] = level
-		sclasses = list(cls.subclasses())
-		if sclasses:
-			return [get_next_level(c, level+1) for c in sclasses]
-
-	get_next_level(start, 0)
-	return ranks
+from ontology.hierarchy import Hierarchy
+from ontology.restrictions import restrictions, assertion
 
 title = "VectorSolv - Warranty Sphere Documentation"
 start = f"""
@@ -101,7 +92,7 @@ def create_html(ontology_file, path):
 	ontology = get_ontology(ontology_file).load()
 
 	all_classes = sorted(list(ontology.classes()), key=lambda c: str(c))
-	r = get_ranks(owl.Thing)
+	hierarchy = Hierarchy(owl.Thing)
 	padding = max(len(str(p)) for p in all_classes)
 	lines = []
 	lines.append("<h3>Table of Contents</h3>")
@@ -120,9 +111,9 @@ def create_html(ontology_file, path):
 	for c in all_classes:
 		# Header
 		# Not sure how this handles multiple inheritance or inferred classes yet.
-		ancestors = sorted(c.ancestors(), key=lambda a: r[a])[:-1]
+		ancestors = hierarchy.ancestors(c)[:0:-1]  # Root first, without c
 		ancestors_string = ' &#8592; ' + ' &#8592; '.join([f"<a href='#{a}'>{a}</a>" for a in reversed(ancestors[1:])])
-		title_string = f"<b style='font-size:150%;background-color:orange;'>{str(c):{padding}}</b> {ancestors_string} ({r[c]-1})"
+		title_string = f"<b style='font-size:150%;background-color:orange;'>{str(c):{padding}}</b> {ancestors_string} ({hierarchy.depth(c)-1})"
 		lines.append(f"<tr><td id={str(c)}>")
 		lines.append(f"{title_string}")
 		lines.append(f"<p style='font-size:120%;'><b style='background-color:orange;'>Definition:</b> {c.definition.first()}</p>")
@@ -130,27 +121,19 @@ def create_html(ontology_file, path):
 		# Assertions
 		lines.append('<div>')
 		lines.append(f"<p><b style='background-color:yellow;'>Assertions:</b></p>")
-		assertions = [(p, '') for p in c.is_a if (p not in all_classes) and (p is not owl.Thing)] # I don't understand p not in all_classes.
+		assertions = [r for p in c.is_a if (p not in all_classes) and (p is not owl.Thing) for r in restrictions(p)] # I don't understand p not in all_classes.
 		if assertions or c.equivalent_to:
 			lines.append(f"<ul style='list-style-type: circle;'>")
 			for clause in c.equivalent_to:
-				assertions.append((str(clause).split('&')[1].strip(), '>'))
+				assertions.extend(restrictions(clause))
 			
-			for assertion, clause_type in assertions:
-				assertion = str(assertion)
-				assertion, cls = assertion[:-1].split('(')
-				relationship, cardinality = assertion.rsplit('.', 1)
-				if ',' in cls:
-					cardinality += " " + cls.split(',')[0].strip()
-					cls = cls.split(',')[1].strip()
-				
-
-				property_name = str(relationship)
+			for prop, cardinality, cls in map(assertion, assertions):
+				property_name = str(prop)
 				span_class = ''
-				prop = {str(p): p for p in ontology.properties()}[relationship]
-				if prop.definition.first():
+				definition = getattr(prop, 'definition', None)  # Inverse properties have none
+				if definition and definition.first():
 					span_class = "class='tooltip'"
-					property_name += f"<span class='tooltiptext'>{property_name}<hr>{prop.definition.first()}</span>"
+					property_name += f"<span class='tooltiptext'>{property_name}<hr>{definition.first()}</span>"
 				
 				lines.append(f'<li><span {span_class}>(eq) {property_name}</span> | {cardinality} | <a href="#{cls}">{cls}</a></li>')
 				# Does Owner have the Equivalent To clause? owns some Product
@@ -6,25 +6,16 @@
 from pprint import pprint
 from pathlib import Path
 from owlready2 import *
+from ontology.loaders import get_datatypes
+from ontology.hierarchy import Hierarchy
+from ontology.restrictions import assertions
 import json
 
-def get_ranks(start):
-	""" Returns the inheritance level in the hierarchy. """
-	ranks = {}
-	def get_next_level(cls, level):
-		ranks[cls] = level
-		sclasses = list(cls.subclasses())
-		if sclasses:
-			return [get_next_level(c, level+1) for c in sclasses]
-
-	get_next_level(start, 0)
-	return ranks
-
-def get_ontology_json(ontology_path):  # Must be single file ontology
-	ontology = get_ontology(str(ontology_path)).load()
+def get_ontology_json(ontology_path, world=None):  # Must be single file ontology
+	ontology = (world or default_world).get_ontology(str(ontology_path)).load()
 	all_classes = sorted(list(ontology.classes()), key=lambda c: str(c))
 	entities = {}
-	r = get_ranks(owl.Thing)
+	hierarchy = Hierarchy(owl.Thing, world=ontology.world)
 
 	relations = {}
 	for c in all_classes:
@@ -40,28 +31,16 @@ def get_ontology_json(ontology_path):  # Must be single file ontology
 		entity = {}
 		entity['Name'] = str(c)
 		entity['Description'] = get_definition(c)
-		entity['Ancestors'] = list(map(str, sorted(c.ancestors(), key=lambda a: r[a], reverse=True)[1:-1]))
+		entity['Ancestors'] = list(map(str, hierarchy.ancestors(c)[1:-1]))
 
 		entity['Assertions'] = []
-		assertions = []		
-		for clause in c.equivalent_to:
-			assertions.append((str(clause).split('&')[1].strip(), '>'))
-		
-		for assertion, clause_type in assertions:
-			assertion = str(assertion)
-			assertion, cls = assertion[:-1].split('(')
-			relationship, cardinality = assertion.rsplit('.', 1)
-			if ',' in cls:
-				cardinality += " " + cls.split(',')[0].strip()
-				cls = cls.split(',')[1].strip()
-			
-
-			property_name = str(relationship)
+		for prop, cardinality, cls in assertions(c):
+			property_name = str(prop)
 			span_class = ''
-			prop = {str(p): p for p in ontology.properties()}[relationship]
-			if prop.definition.first():
+			definition = getattr(prop, 'definition', None)  # Inverse properties have none
+			if definition and definition.first():
 				span_class = "class='tooltip'"
-				property_name += f"<span class='tooltiptext'>{property_name}<hr>{prop.definition.first()}</span>"
+				property_name += f"<span class='tooltiptext'>{property_name}<hr>{definition.first()}</span>"
 			
 			entity['Assertions'].append({
 				'property': property_name,
@@ -103,19 +82,7 @@ def get_ontology_json(ontology_path):  # Must be single file ontology
 		entities[entity["Name"]] = entity
 
 	
-	# Create custom datatype extractor since owlready2 doesn't seem to support this.
-	# It is assumed that all data types are an enumeration.
-	from bs4 import BeautifulSoup
-
-	datatypes = {}
-	bs = BeautifulSoup(open(ontology_path).read(), features="xml")
-	definitions = bs.find('rdf:RDF')
-	if definitions:
-		for datatype in definitions.find_all("rdfs:Datatype", recursive=False):
-			name = datatype["rdf:about"].rsplit('/', 1)[1].replace('#', '.')
-			enumeration = [dict(enumerate(y.contents)).get(0, "") for y in datatype.find_all('first')]
-			datatypes[name] = enumeration
-	
+	datatypes = get_datatypes(ontology)
 	return entities, relations, datatypes
 
 if __name__ == '__main__':
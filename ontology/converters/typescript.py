@@ -4,6 +4,9 @@ import os
 sys.path.insert(1, os.path.join(sys.path[0], '..'))
 
 from ontology.factory import ClassFactory
+from ontology.loaders import get_datatypes
+from ontology.hierarchy import Hierarchy
+from ontology.restrictions import assertions
 from pprint import pprint
 from pathlib import Path
 from owlready2 import *
@@ -23,19 +26,7 @@ class OwlToOntologyJsonConverter:
 		self.ontology_file = str(ontology_path)
 		self.ontology = get_ontology(self.ontology_file).load()
 		self.all_classes = sorted(list(self.ontology.classes()), key=lambda c: str(c))
-		self.ranks = self.get_ranks(owl.Thing)
-
-	@staticmethod
-	def get_ranks(start):
-		ranks = {}
-		def get_next_level(cls, level):
-			ranks[cls] = level
-			sclasses = list(cls.subclasses())
-			if sclasses:
-				return [get_next_level(c, level+1) for c in sclasses]
-
-		get_next_level(start, 0)
-		return ranks
+		self.hierarchy = Hierarchy(owl.Thing)
 
 	def parse(self, save=None):
 		def format(domain_or_range):
@@ -54,29 +45,17 @@ class OwlToOntologyJsonConverter:
 			entity = {}
 			entity['Name'] = str(c)
 			entity['Description'] = get_definition(c)
-			entity['Ancestors'] = list(map(str, sorted(c.ancestors(), key=lambda a: self.ranks[a], reverse=True)[1:-1]))
+			entity['Ancestors'] = list(map(str, self.hierarchy.ancestors(c)[1:-1]))
 
 			# Assertions
 			entity['Assertions'] = []
-			assertions = []		
-			for clause in c.equivalent_to:
-				assertions.append((str(clause).split('&')[1].strip(), '>'))
-			
-			for assertion, clause_type in assertions:
-				assertion = str(assertion)
-				assertion, cls = assertion[:-1].split('(')
-				relationship, cardinality = assertion.rsplit('.', 1)
-				if ',' in cls:
-					cardinality += " " + cls.split(',')[0].strip()
-					cls = cls.split(',')[1].strip()
-				
-
-				property_name = str(relationship)
+			for prop, cardinality, cls in assertions(c):
+				property_name = str(prop)
 				span_class = ''
-				prop = {str(p): p for p in self.ontology.properties()}[relationship]
-				if prop.definition.first():
+				definition = getattr(prop, 'definition', None)  # Inverse properties have none
+				if definition and definition.first():
 					span_class = "class='tooltip'"
-					property_name += f"<span class='tooltiptext'>{property_name}<hr>{prop.definition.first()}</span>"
+					property_name += f"<span class='tooltiptext'>{property_name}<hr>{definition.first()}</span>"
 				
 				entity['Assertions'].append({
 					'property': property_name,
@@ -117,19 +96,7 @@ class OwlToOntologyJsonConverter:
 					})
 			entities[entity["Name"]] = entity
 
-		# Create custom datatype extractor since owlready2 doesn't seem to support this.
-		# It is assumed that all data types are an enumeration.
-		from bs4 import BeautifulSoup
-
-		datatypes = {}
-		bs = BeautifulSoup(open(self.ontology_file).read(), features="xml")
-		definitions = bs.find('rdf:RDF')
-		if definitions:
-			for datatype in definitions.find_all("rdfs:Datatype", recursive=False):
-				name = datatype["rdf:about"].rsplit('/', 1)[1].replace('#', '.')
-				enumeration = [dict(enumerate(y.contents)).get(0, "") for y in datatype.find_all('first')]
-				datatypes[name] = enumeration
-		
+		datatypes = get_datatypes(self.ontology)
 
 		if save:
 			base = save + '/'
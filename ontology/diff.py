@@ -0,0 +1,99 @@
+""" Compares two snapshots of an ontology, the (entities, relations, datatypes) of loaders.owl_to_json.
+
+	Re-exporting an ontology usually only changes a few classes, apply() updates the graph of the previous
+	snapshot in place instead of rebuilding it with json_to_graph.
+"""
+
+import ontology.loaders as loaders
+
+
+def compare(old, new):
+	""" Returns {"added": [names], "removed": [names], "changed": {name: [keys that differ]}} of two dicts. """
+	changed = {}
+	for name in old.keys() & new.keys():
+		if old[name] != new[name]:
+			if isinstance(old[name], dict) and isinstance(new[name], dict):
+				changed[name] = sorted(key for key in old[name].keys() | new[name].keys() if old[name].get(key) != new[name].get(key))
+			else:
+				changed[name] = []
+	return {
+		"added": [name for name in new if name not in old],
+		"removed": [name for name in old if name not in new],
+		"changed": dict(sorted(changed.items())),
+	}
+
+
+def diff(old, new):
+	""" Returns the added, removed and changed entities, relations and datatypes between two snapshots. """
+	return {kind: compare(a, b) for kind, a, b in zip(("entities", "relations", "datatypes"), old, new)}
+
+
+def is_empty(difference):
+	return not any(part["added"] or part["removed"] or part["changed"] for part in difference.values())
+
+
+def _endpoints(relation):
+	""" (domain, range) of a relation json_to_graph draws an edge for, None for the ones it skips. """
+	domain, range_ = relation['Domain'], relation['Range']
+	if len(domain) == 1 and len(domain[0]) == 1 and len(range_) == 1 and len(range_[0]) == 1:
+		return domain[0][0], range_[0][0]
+	return None
+
+
+def _references(cls):
+	""" Names of the nodes an entity draws an edge to: its first ancestor, assertion targets and data properties. """
+	return [*cls['Ancestors'][:1], *(a['target'] for a in cls['Assertions']), *(d['Name'] for d in cls['Data'])]
+
+
+def apply(graph, old, new, difference=None):
+	""" Updates graph, built by json_to_graph from the old snapshot, to the graph of the new one and returns
+		the difference.
+
+		Only the nodes of changed entities and relations are rebuilt: their edges are removed, then
+		json_to_graph is run on just the entities and relations that draw an edge to them. The nodes and
+		edges end up with the attributes a full rebuild would give them, but new ones are appended, so
+		their order can differ. Graphs built with include_orphan_nodes=False aren't supported.
+	"""
+	if difference is None:
+		difference = diff(old, new)
+	(old_entities, old_relations, _), (entities, relations, datatypes) = old, new
+	loaders.add_titles(graph)
+
+	# The nodes whose edges or attributes may have changed
+	dirty = set()
+	for name in [*difference["entities"]["removed"], *difference["entities"]["changed"]]:
+		dirty.add(name)
+		dirty.update(_references(old_entities[name]))
+	for name in [*difference["entities"]["added"], *difference["entities"]["changed"]]:
+		dirty.add(name)
+		dirty.update(_references(entities[name]))
+	for name in [*difference["relations"]["removed"], *difference["relations"]["changed"]]:
+		dirty.update(_endpoints(old_relations[name]) or ())
+	for name in [*difference["relations"]["added"], *difference["relations"]["changed"]]:
+		dirty.update(_endpoints(relations[name]) or ())
+	if not dirty:
+		return difference
+
+	# Everything that draws an edge to a dirty node, in the order json_to_graph would add it
+	partial = loaders.json_to_graph(
+		{name: cls for name, cls in entities.items() if name in dirty or not dirty.isdisjoint(_references(cls))},
+		{name: rel for name, rel in relations.items() if not dirty.isdisjoint(_endpoints(rel) or ())},
+		datatypes,
+	)
+
+	neighbours = set()
+	for name in dirty:
+		if name in graph:
+			neighbours.update(graph.adj[name])
+			graph.remove_edges_from([(name, neighbour) for neighbour in list(graph.adj[name])])
+
+	for name in dirty:
+		if name in partial:
+			graph.add_node(name)
+			graph.nodes[name].clear()
+			graph.nodes[name].update(partial.nodes[name])
+	graph.add_edges_from((a, b, dict(data)) for a, b, data in partial.edges(data=True) if a in dirty or b in dirty)
+
+	# Nodes that are neither entities nor drawn by an edge anymore
+	graph.remove_nodes_from([name for name in dirty | neighbours if name in graph and name not in entities and not graph.adj[name]])
+	return difference
@@ -69,6 +69,7 @@ language of choice. Below is an example in python.
 		
 """
 from ontology.converters.owl_to_json import get_ontology_json
+import ontology.cache as cache
 from pathlib import Path
 from pprint import pprint
 import pandas as pd
@@ -84,8 +85,16 @@ class ClassFactory:
 
 	@classmethod
 	def get_ontology(cls, ontology_name):
+		# Cached, so building many classes of the same ontology only parses it once
 		path = cls.ONTOLOGY_PATHS[ontology_name]
-		return get_ontology_json(path)
+		return cache.load(path, get_ontology_json)
+
+	@classmethod
+	def get_ontologies(cls, ontology_names=None, jobs=0):
+		""" Loads several ontologies at once, in parallel, eg: at startup. All of them by default. """
+		ontology_names = list(cls.ONTOLOGY_PATHS) if ontology_names is None else list(ontology_names)
+		paths = [cls.ONTOLOGY_PATHS[name] for name in ontology_names]
+		return dict(zip(ontology_names, cache.load_many(paths, get_ontology_json, jobs)))
 
 	@classmethod
 	def from_named_ontology(cls, ontology_name, entity_name):
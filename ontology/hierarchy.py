@@ -0,0 +1,78 @@
+""" Index of an ontology's class hierarchy, shared by the loaders and converters. """
+
+from owlready2 import Thing
+
+
+class Hierarchy:
+	""" Subclasses, parents, depths and ancestors of every class below root (owl.Thing by default).
+
+		Built iteratively in one breadth first pass, so deep hierarchies can't hit the recursion limit and
+		classes with several parents are only expanded once. The depth of a class is the length of the
+		longest path from root, so every class is deeper than each of its ancestors.
+	"""
+	def __init__(self, root=Thing, world=None):
+		self.root = root
+		self._subclasses = {}
+		self._parents = {root: []}
+		self._ancestors = {}
+
+		# Breadth first to find every class and its subclasses once
+		order = [root]
+		for cls in order:
+			self._subclasses[cls] = subclasses = list(dict.fromkeys(cls.subclasses(world=world)))
+			for subclass in subclasses:
+				if subclass not in self._parents:
+					self._parents[subclass] = []
+					order.append(subclass)
+				self._parents[subclass].append(cls)
+
+		# Longest path depths, a class is settled once all of its parents are (Kahn's algorithm)
+		self._depth = {root: 0}
+		waiting = {cls: len(parents) for cls, parents in self._parents.items()}
+		ready = [root]
+		for cls in ready:
+			for subclass in self._subclasses[cls]:
+				self._depth[subclass] = max(self._depth.get(subclass, 0), self._depth[cls] + 1)
+				waiting[subclass] -= 1
+				if waiting[subclass] == 0:
+					ready.append(subclass)
+
+		# Classes in a subclass cycle (eg: equivalent classes) keep the depth of the first path that reached them
+		for cls in order:
+			if cls not in self._depth:
+				self._depth[cls] = min(self._depth[parent] for parent in self._parents[cls] if parent in self._depth) + 1
+
+	def __contains__(self, cls):
+		return cls in self._depth
+
+	def __len__(self):
+		return len(self._depth)
+
+	def classes(self):
+		""" Every class below root and root itself, parents before their subclasses. """
+		return sorted(self._depth, key=self._depth.get)
+
+	def subclasses(self, cls):
+		return self._subclasses[cls]
+
+	def parents(self, cls):
+		return self._parents[cls]
+
+	def depth(self, cls):
+		""" Inheritance level, 0 for root. """
+		return self._depth[cls]
+
+	def ancestors(self, cls, include_self: bool=True):
+		""" Returns the ancestors of cls, deepest first and ending with root. """
+		if cls not in self._ancestors:
+			seen = {cls}
+			stack = [cls]
+			while stack:
+				for parent in self._parents[stack.pop()]:
+					if parent not in seen:
+						seen.add(parent)
+						stack.append(parent)
+			self._ancestors[cls] = sorted(seen, key=lambda a: (-self._depth[a], str(a)))
+
+		ancestors = self._ancestors[cls]
+		return list(ancestors) if include_self else ancestors[1:]
@@ -0,0 +1,205 @@
+""" Computes node positions for drawing large graphs.
+
+	Every layout takes a networkx graph and returns {node: numpy array [x, y]} scaled to [-1, 1],
+	the same format as networkx's layouts, so they can be passed straight to nx.draw.
+"""
+
+import numpy as np
+import networkx as nx
+
+
+def force_layout(graph, iterations: int=50, seed: int=0, gravity: float=1.0, pos: dict=None):
+	""" Force directed layout that scales to large graphs.
+
+		Uses Fruchterman-Reingold forces, but the repulsion is approximated Barnes-Hut style on a quadtree:
+		far away cells act as a single point at their center of mass, only the neighbouring cells are
+		computed node by node. Each level of the quadtree is a grid, so every step is a vectorized numpy
+		operation and an iteration costs O(n log n) instead of networkx's O(n²).
+		Gravity pulls nodes to the center so disconnected components don't drift apart.
+		pos optionally gives starting positions for some of the nodes.
+	"""
+	nodes = list(graph)
+	n = len(nodes)
+	if n == 0:
+		return {}
+	if n == 1:
+		return {nodes[0]: np.zeros(2)}
+
+	index = {node: i for i, node in enumerate(nodes)}
+	edges = np.array([(index[u], index[v]) for u, v in graph.edges() if u != v], dtype=np.int64).reshape(-1, 2)
+
+	positions = np.random.default_rng(seed).random((n, 2))
+	if pos:
+		for node, xy in pos.items():
+			if node in index:
+				positions[index[node]] = xy
+		positions = (positions - positions.min(axis=0)) / np.maximum(np.ptp(positions, axis=0), 1e-9)
+
+	k = np.sqrt(1.0 / n)  # Optimal distance between nodes
+	temperature = 0.1
+	cooling = temperature / (iterations + 1)
+	for _ in range(iterations):
+		displacement = _repulsion(positions, k)
+
+		# Attraction along the edges
+		if len(edges):
+			delta = positions[edges[:, 0]] - positions[edges[:, 1]]
+			distance = np.maximum(np.linalg.norm(delta, axis=1), 1e-9)
+			force = delta * (distance / k)[:, None]
+			for axis in range(2):
+				displacement[:, axis] -= np.bincount(edges[:, 0], force[:, axis], minlength=n)
+				displacement[:, axis] += np.bincount(edges[:, 1], force[:, axis], minlength=n)
+
+		# Gravity
+		delta = positions - positions.mean(axis=0)
+		distance = np.maximum(np.linalg.norm(delta, axis=1), 1e-9)
+		displacement -= gravity * k * delta / distance[:, None]
+
+		# Move each node at most `temperature` and cool down
+		length = np.maximum(np.linalg.norm(displacement, axis=1), 1e-9)
+		positions += displacement * (np.minimum(length, temperature) / length)[:, None]
+		temperature -= cooling
+
+	return dict(zip(nodes, _rescale(positions)))
+
+
+def _repulsion(positions, k, leaf_size: int=2, max_elements: int=4_000_000):
+	""" Returns the Fruchterman-Reingold repulsion k²/d on every node, approximated with a quadtree. """
+	n = len(positions)
+	x, y = positions[:, 0], positions[:, 1]
+	force_x, force_y = np.zeros(n), np.zeros(n)
+
+	def repel(dx, dy, weight):
+		w = weight * (k * k) / np.maximum(dx * dx + dy * dy, 1e-12)
+		return (dx * w).sum(axis=1), (dy * w).sum(axis=1)
+
+	# Map into the unit square, the quadtree's level l is then a 2^l by 2^l grid
+	low = positions.min(axis=0)
+	span = max(np.ptp(positions, axis=0).max(), 1e-9)
+	unit = np.minimum((positions - low) / span, 1 - 1e-9)
+	depth = max(2, int(np.ceil(np.log(n / leaf_size) / np.log(4))))
+
+	# Dense clusters crowd the finest cells, go a few levels deeper until they hold about leaf_size nodes
+	for _ in range(3):
+		side = 2 ** depth
+		occupied = len(np.unique((unit[:, 0] * side).astype(np.int64) * side + (unit[:, 1] * side).astype(np.int64)))
+		if n / occupied <= leaf_size:
+			break
+		depth += 1
+
+	# Far field: for each level, the children of the parent's neighbours that aren't our own neighbours.
+	# That's a 6x6 block of cells around the parent, minus the 3x3 block around the node's own cell.
+	offsets = np.arange(6)
+	for level in range(2, depth + 1):
+		side = 2 ** level
+		cell_x, cell_y = (unit[:, 0] * side).astype(np.int64), (unit[:, 1] * side).astype(np.int64)
+		flat = cell_x * side + cell_y
+		mass = np.bincount(flat, minlength=side * side).astype(float)
+		center_x = np.bincount(flat, x, minlength=side * side) / np.maximum(mass, 1)
+		center_y = np.bincount(flat, y, minlength=side * side) / np.maximum(mass, 1)
+
+		candidate_x = (cell_x // 2 * 2 - 2)[:, None] + offsets  # (n, 6)
+		candidate_y = (cell_y // 2 * 2 - 2)[:, None] + offsets
+		inside = ((candidate_x >= 0) & (candidate_x < side))[:, :, None] & ((candidate_y >= 0) & (candidate_y < side))[:, None, :]
+		far = (np.abs(candidate_x - cell_x[:, None]) > 1)[:, :, None] | (np.abs(candidate_y - cell_y[:, None]) > 1)[:, None, :]
+		candidate = np.where(inside, candidate_x[:, :, None] * side + candidate_y[:, None, :], 0).reshape(n, 36)
+		weight = np.where((inside & far).reshape(n, 36), mass[candidate], 0)
+		fx, fy = repel(x[:, None] - center_x[candidate], y[:, None] - center_y[candidate], weight)
+		force_x += fx
+		force_y += fy
+
+	# Near field: node by node within the 3x3 neighbourhood of the finest level
+	side = 2 ** depth
+	cell_x, cell_y = (unit[:, 0] * side).astype(np.int64), (unit[:, 1] * side).astype(np.int64)
+	flat = cell_x * side + cell_y
+	order = np.argsort(flat, kind="stable")
+	counts = np.bincount(flat, minlength=side * side)
+	starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+	width = counts.max()
+	slots = np.arange(width)
+	members = np.where(slots[None, :] < counts[:, None], order[np.minimum(starts[:, None] + slots[None, :], n - 1)], -1)
+
+	# Batch the nodes so a crowded cell can't blow up memory
+	batch = max(1, max_elements // (9 * width))
+	for start in range(0, n, batch):
+		stop = min(start + batch, n)
+		own = np.arange(start, stop)[:, None]
+		for dx in (-1, 0, 1):
+			for dy in (-1, 0, 1):
+				neighbour_x, neighbour_y = cell_x[start:stop] + dx, cell_y[start:stop] + dy
+				inside = (neighbour_x >= 0) & (neighbour_x < side) & (neighbour_y >= 0) & (neighbour_y < side)
+				others = members[np.where(inside, neighbour_x * side + neighbour_y, 0)]  # (batch, width)
+				valid = inside[:, None] & (others >= 0) & (others != own)
+				others = np.maximum(others, 0)
+				fx, fy = repel(x[start:stop, None] - x[others], y[start:stop, None] - y[others], valid)
+				force_x[start:stop] += fx
+				force_y[start:stop] += fy
+
+	return np.stack([force_x, force_y], axis=1)
+
+
+def hierarchical_layout(graph, sweeps: int=4):
+	""" Layered layout for DAGs, eg: import graphs.
+
+		Nodes are placed in rows by longest path from the sources, then each row is reordered by the
+		average position of its neighbours (the barycenter heuristic) to reduce crossings.
+		Cycles are collapsed first, the nodes of a cycle share a row. Undirected graphs are directed away
+		from the most connected node of each of their connected components.
+	"""
+	if len(graph) == 0:
+		return {}
+	if graph.is_directed():
+		directed = graph.copy()
+	else:
+		# A breadth first tree from the most connected node of each connected component, in graph order on ties
+		component_of = {node: i for i, component in enumerate(nx.connected_components(graph)) for node in component}
+		roots = {}
+		for node in graph:
+			i = component_of[node]
+			if i not in roots or graph.degree(node) > graph.degree(roots[i]):
+				roots[i] = node
+		directed = nx.DiGraph(nx.compose_all([nx.bfs_tree(graph, root) for root in roots.values()]))
+	directed.add_nodes_from(graph)
+
+	condensed = nx.condensation(directed)
+	rows = []
+	for generation in nx.topological_generations(condensed):
+		rows.append([node for component in sorted(generation) for node in sorted(condensed.nodes[component]["members"], key=str)])
+
+	# Barycenter sweeps, down using predecessors then up using successors
+	position = {node: i for row in rows for i, node in enumerate(row)}
+	for sweep in range(sweeps):
+		down = sweep % 2 == 0
+		neighbours = directed.predecessors if down else directed.successors
+		for row in (rows[1:] if down else rows[-2::-1]):
+			def barycenter(node):
+				adjacent = [position[a] for a in neighbours(node)]
+				return sum(adjacent) / len(adjacent) if adjacent else position[node]
+			row.sort(key=barycenter)
+			position.update({node: i for i, node in enumerate(row)})
+
+	widest = max(len(row) for row in rows)
+	positions = np.array([
+		((i - (len(row) - 1) / 2) / max(widest - 1, 1), -depth / max(len(rows) - 1, 1))
+		for depth, row in enumerate(rows)
+		for i, node in enumerate(row)
+	], dtype=float)
+	return dict(zip([node for row in rows for node in row], _rescale(positions)))
+
+
+def spring_layout(graph):
+	""" networkx's spring layout, O(n²) per iteration, fine for small graphs. """
+	return nx.spring_layout(graph, k=0.15, iterations=20)
+
+
+def _rescale(positions):
+	positions = positions - positions.mean(axis=0)
+	scale = np.abs(positions).max()
+	return positions / scale if scale > 0 else positions
+
+
+LAYOUTS = {
+	"force": force_layout,
+	"hierarchical": hierarchical_layout,
+	"spring": spring_layout,
+}
@@ -1,73 +1,154 @@
 """ This file loads ontologies into a common graph format. """
 
 import ontology
+from ontology import profiling
+from ontology.hierarchy import Hierarchy
+from ontology.restrictions import assertions
 from pprint import pprint
 from pathlib import Path
 from owlready2 import *
+import os
 import json
 import networkx as nx
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
-def owl_to_json(ontology_path):
+@profiling.profiled()
+def owl_to_json(ontology_path, world=None):
 	""" Returns a json representation of the ontology.
 
 		ontology_path must be a single file ontology.
 		In protege, turn on the reasoner, export inferred axioms to "something.owl".
 		Select all options (eg: annotations) then run this function with it.
+		world is the owlready2 World to load it into, the default world if None.
 	"""
+	with profiling.stage("owl_to_json.load"):
+		ontology = (world or default_world).get_ontology(str(ontology_path)).load()
+	return OntologyIndex(ontology).to_json()
 
-	def get_ranks(start):
-		""" Returns the inheritance level in the hierarchy. """
-		ranks = {}
-		def get_next_level(cls, level):
-			ranks[cls] = level
-			sclasses = list(cls.subclasses())
-			if sclasses:
-				return [get_next_level(c, level+1) for c in sclasses]
-
-		get_next_level(start, 0)
-		return ranks
-
-	ontology = get_ontology(str(ontology_path)).load()
-	all_classes = sorted(list(ontology.classes()), key=lambda c: str(c))
-	entities = {}
-	r = get_ranks(owl.Thing)
-
-	relations = {}
-	for c in all_classes:
-		def format(domain_or_range):
-			l = list(map(str, domain_or_range))
-			l = [list(filter(lambda c: c.strip() != "annotations.vs:null", map(str.strip, rng.split('|')))) for rng in l]
-			return l
-
-		def get_definition(e):
-			e = getattr(e, 'definition', None)
-			return e[0] if e else None
 
+def _load_in_new_world(ontology_path, loader):
+	# A World of its own, so ontologies don't share a quadstore or collide on their IRIs
+	world = World()
+	try:
+		return loader(ontology_path, world=world)
+	finally:
+		world.close()
+
+
+def owl_files_to_json(ontology_paths, jobs: int=0, loader=owl_to_json):
+	""" Returns [loader(path) for path in ontology_paths], loading the ontologies concurrently.
+
+		Each ontology is loaded in its own World, in a pool of jobs processes (0 uses every core).
+		loader must accept a world keyword, like owl_to_json.
+	"""
+	ontology_paths = list(ontology_paths)
+	if jobs == 0:
+		jobs = os.cpu_count() or 1
+	jobs = min(jobs, len(ontology_paths))
+
+	load = partial(_load_in_new_world, loader=loader)
+	if jobs <= 1:
+		return [load(path) for path in ontology_paths]
+
+	with ProcessPoolExecutor(max_workers=jobs) as executor:
+		return list(executor.map(load, ontology_paths))
+
+
+def _format(domain_or_range):
+	l = list(map(str, domain_or_range))
+	l = [list(filter(lambda c: c.strip() != "annotations.vs:null", map(str.strip, rng.split('|')))) for rng in l]
+	return l
+
+
+def _definition(e):
+	e = getattr(e, 'definition', None)
+	return e[0] if e else None
+
+
+def _named_classes(expression):
+	""" Returns the IRIs of the named classes in a domain or range, looking inside unions and intersections. """
+	if hasattr(expression, 'iri'):
+		return [expression.iri]
+	return [iri for e in getattr(expression, 'Classes', []) for iri in _named_classes(e)]
+
+
+class OntologyIndex:
+	""" Indexes a loaded owlready2 ontology so the json of each entity can be computed on its own.
+
+		Entities and relations are only converted when first asked for, then cached.
+		to_json() converts everything, in the format of owl_to_json.
+	"""
+	def __init__(self, ontology):
+		self.ontology = ontology
+		self.classes = {str(c): c for c in sorted(ontology.classes(), key=str)}
+		with profiling.stage("OntologyIndex.hierarchy"):
+			self.hierarchy = Hierarchy(owl.Thing, world=ontology.world)
+		self._entities = {}
+		self._relations = {}
+		self._datatypes = None
+
+		# Index the properties once rather than scanning them for every class.
+		# Domains are matched on exact IRIs, so eg: Claim doesn't pick up the properties of ClaimEvidence.
+		with profiling.stage("OntologyIndex.properties"):
+			self.properties = {str(p): p for p in ontology.properties()}
+			self.object_properties = list(ontology.object_properties())
+			self.object_properties_by_domain = {}
+			for i, op in enumerate(self.object_properties):
+				for iri in {iri for d in op.domain for iri in _named_classes(d)}:
+					self.object_properties_by_domain.setdefault(iri, []).append(i)
+			self.data_properties_by_domain = {}
+			for dp in ontology.data_properties():
+				for iri in dict.fromkeys(d.iri for d in dp.domain if hasattr(d, 'iri')):
+					self.data_properties_by_domain.setdefault(iri, []).append(dp)
+
+	def __contains__(self, name):
+		return name in self.classes
+
+	def __len__(self):
+		return len(self.classes)
+
+	def object_properties_of(self, c):
+		""" The object properties of the class's ancestors then of the class, a property can be in both. """
+		properties = []
+		for classes in [self.hierarchy.ancestors(c)[1:-1], [c]]:
+			matches = sorted({i for x in classes for i in self.object_properties_by_domain.get(x.iri, [])})
+			properties.extend(self.object_properties[i] for i in matches)
+		return properties
+
+	def relation(self, name):
+		if name not in self._relations:
+			op = self.properties[name]
+			self._relations[name] = {
+				"Definition": _definition(op),
+				"Domain": _format(op.domain),
+				"Range": _format(op.range)
+			}
+		return self._relations[name]
+
+	def entity(self, name):
+		if name not in self._entities:
+			self._entities[name] = self._entity(self.classes[name])
+		return self._entities[name]
+
+	@profiling.profiled("entity")
+	def _entity(self, c):
 		entity = {}
 		entity['Name'] = str(c)
-		entity['Definition'] = get_definition(c)
-		entity['Ancestors'] = list(map(str, sorted(c.ancestors(), key=lambda a: r[a], reverse=True)[1:-1]))
+		entity['Definition'] = _definition(c)
+		with profiling.stage("entity.ancestors"):
+			entity['Ancestors'] = list(map(str, self.hierarchy.ancestors(c)[1:-1]))
 
 		entity['Assertions'] = []
-		assertions = []		
-		for clause in c.equivalent_to:
-			assertions.append((str(clause).split('&')[1].strip(), '>'))
-		
-		for assertion, clause_type in assertions:
-			assertion = str(assertion)
-			assertion, cls = assertion[:-1].split('(')
-			relationship, cardinality = assertion.rsplit('.', 1)
-			if ',' in cls:
-				cardinality += " " + cls.split(',')[0].strip()
-				cls = cls.split(',')[1].strip()
-			
-
-			property_name = str(relationship)
+		with profiling.stage("entity.assertions"):
+			class_assertions = assertions(c)
+		for prop, cardinality, cls in class_assertions:
+			property_name = str(prop)
 			span_class = ''
-			prop = {str(p): p for p in ontology.properties()}[relationship]
-			if prop.definition.first():
+			definition = getattr(prop, 'definition', None)  # Inverse properties have none
+			if definition and definition.first():
 				span_class = "class='tooltip'"
-				property_name += f"<span class='tooltiptext'>{property_name}<hr>{prop.definition.first()}</span>"
+				property_name += f"<span class='tooltiptext'>{property_name}<hr>{definition.first()}</span>"
 			
 			entity['Assertions'].append({
 				'property': property_name,
@@ -77,178 +158,237 @@ def owl_to_json(ontology_path):
 			
 		# Relations
 		entity["Relations"] = []
-		for subtitle, classes in [('Inherited', entity['Ancestors']), ('Derived', [c])]:
-			for op in filter(lambda op: any(str(x) in str(op.domain) for x in classes), ontology.object_properties()):
-				# Build relations list
-				if str(op) not in relations:
-					relations[str(op)] = {
-						"Definition": get_definition(op),
-						"Domain": format(op.domain),
-						"Range": format(op.range)
-					}
-
-				# Also append to entity Relations
-				entity['Relations'].append({
-					"Name": str(op),
-					"Definition": get_definition(op),
-					# "Domain": format(op.domain),  # Don't need domain since this class is a domain.
-					"Range": format(op.range),
-				})
+		with profiling.stage("entity.relations"):
+			object_properties = self.object_properties_of(c)
+		for op in object_properties:
+			entity['Relations'].append({
+				"Name": str(op),
+				"Definition": _definition(op),
+				# "Domain": format(op.domain),  # Don't need domain since this class is a domain.
+				"Range": _format(op.range),
+			})
 
 		# Properties
 		entity["Data"] = []
-		for dp in ontology.data_properties():
-			domain_as_list = list(str(d) for d in dp.domain)
-			if str(c) not in domain_as_list:
-				continue
-
-			# Append to entity Relations
+		for dp in self.data_properties_by_domain.get(c.iri, []):
 			entity['Data'].append({
 				"Name": str(dp),
-				"Definition": get_definition(dp),
-				"Domain": format(dp.domain),
-				"Range": format(dp.range),
+				"Definition": _definition(dp),
+				"Domain": _format(dp.domain),
+				"Range": _format(dp.range),
 			})
-		entities[entity["Name"]] = entity
-
-	
-	# Create custom datatype extractor since owlready2 doesn't seem to support this.
-	# It is assumed that all data types are an enumeration.
-	from bs4 import BeautifulSoup
-
+		return entity
+
+	def datatypes(self):
+		if self._datatypes is None:
+			self._datatypes = get_datatypes(self.ontology)
+		return self._datatypes
+
+	def to_json(self, names=None):
+		""" Returns (entities, relations, datatypes) for the named entities, all of them by default. """
+		entities = {}
+		relations = {}
+		for name in (self.classes if names is None else names):
+			entities[name] = self.entity(name)
+			for relation in entities[name]['Relations']:
+				if relation['Name'] not in relations:
+					relations[relation['Name']] = self.relation(relation['Name'])
+		return entities, relations, self.datatypes()
+
+
+@profiling.profiled()
+def get_datatypes(ontology):
+	""" Returns {name: enumeration} for the datatypes declared in the ontology.
+
+		Read from the triples owlready2 already loaded, since its classes don't expose datatypes.
+		It is assumed that all data types are an enumeration, the values are gathered from every list
+		(eg: owl:oneOf) under the datatype, in order.
+	"""
+	graph = ontology.graph
 	datatypes = {}
-	bs = BeautifulSoup(open(ontology_path).read(), features="xml")
-	definitions = bs.find('rdf:RDF')
-	if definitions:
-		for datatype in definitions.find_all("rdfs:Datatype", recursive=False):
-			name = datatype["rdf:about"].rsplit('/', 1)[1].replace('#', '.')
-			enumeration = [dict(enumerate(y.contents)).get(0, "") for y in datatype.find_all('first')]
-			datatypes[name] = enumeration
-	
-	return entities, relations, datatypes
-
-
-def json_to_graph(entities, relations, datatypes, include_orphan_nodes:bool=True):
-	def remove_prefixed_classes(sentence):
-		# Remove the prefixes
-		sentence = ' '.join(w.split('.')[-1] for w in sentence.split(' '))
+	declarations = graph.execute("SELECT s FROM objs WHERE c=? AND p=? AND o=? ORDER BY rowid", (graph.c, rdf_type, rdfs_datatype))
+	for datatype, in declarations.fetchall():  # In the order of the file
+		if datatype < 0:  # Anonymous, eg: the enumeration inside an owl:equivalentClass
+			continue
 
-		# Replace 'a' with 'an' if there is a vowel.
-		words = sentence.split(' ')
-		if len(words) == 3:
-			if words[1].endswith('a') and any(words[2].lower().startswith(vowel) for vowel in 'aeiou'):
-				words[1] += 'n'
-			sentence = ' '.join(words)
+		enumeration = []
+		stack, seen = [datatype], {datatype}
+		while stack:
+			node = stack.pop()
+			children = [o for p, o, d in graph._get_triples_s_pod(node) if d is None and isinstance(o, int) and o < 0]
+			first = graph._get_triple_sp_od(node, rdf_first)
+			if first:
+				value, d = first
+				if d is not None:
+					enumeration.append(str(value))
+				elif value > 0:
+					enumeration.append("")  # A resource has no text
+				else:
+					children.sort(key=lambda o: o != value)  # An anonymous item comes before the rest of the list
+
+			# Depth first into the anonymous nodes
+			for child in reversed(children):
+				if child not in seen:
+					seen.add(child)
+					stack.append(child)
+
+		name = ontology.world._unabbreviate(datatype).rsplit('/', 1)[1].replace('#', '.')
+		datatypes[name] = enumeration
+
+	return datatypes
+
+
+def remove_prefixed_classes(sentence):
+	# Remove the prefixes
+	words = [w.rpartition('.')[2] for w in sentence.split(' ')]
+
+	# Replace 'a' with 'an' if there is a vowel.
+	if len(words) == 3 and words[1].endswith('a') and words[2].lower().startswith(('a', 'e', 'i', 'o', 'u')):
+		words[1] += 'n'
+
+	return ' '.join(words)
+
+
+# How each kind of title is written, from the arguments recorded by json_to_graph
+TITLES = {
+	"relation": lambda a, name, b: remove_prefixed_classes(f"{a} {name} {b}"),
+	"is-a": lambda name, ancestor: remove_prefixed_classes(f"{name} is-a {ancestor}"),
+	"assertion": lambda name, prop, cardinality, target: remove_prefixed_classes(f"<b> {name}</b> {prop} {cardinality} <b> {target}</b>"),
+	"entity": lambda name, definition: f'<u>{remove_prefixed_classes(name)}</u><br>{definition if definition else ""}',
+	"datatype": lambda name, r, d: f'<u>{remove_prefixed_classes(name)}</u>  {r}<br>{d}',
+	"has-a": lambda name, data_name: remove_prefixed_classes(f"{name} has-a {data_name}"),
+}
+
+
+@profiling.profiled()
+def add_titles(graph):
+	""" Writes the html titles that json_to_graph(lazy_titles=True) left as None, eg: before a visualization. """
+	pending = graph.graph.pop('pending_titles', None)
+	if not pending:
+		return graph
+
+	# Subgraph views share the titles of the whole graph, write all of them there
+	root = graph
+	while hasattr(root, '_graph'):
+		root = root._graph
+	for key, kind, args in pending:
+		attributes = root.nodes[key] if isinstance(key, str) else root.edges[key]
+		attributes['title'] = TITLES[kind](*args)
+	return graph
 
-		return sentence
-		
 
-	# Populate an empty graph
-	graph = nx.Graph()
+@profiling.profiled()
+def json_to_graph(entities, relations, datatypes, include_orphan_nodes:bool=True, lazy_titles:bool=False):
+	""" Builds the graph of the ontology from the json of owl_to_json.
 
-	# Load other relationships (object properties)
+		Nodes and edges are inserted in bulk. With lazy_titles, the html titles are left
+		as None and only written by add_titles(), which the visualizer calls.
+	"""
+	pending = []
+	def title(key, kind, *args):
+		if lazy_titles:
+			pending.append((key, kind, args))
+			return None
+		return TITLES[kind](*args)
+
+	# Nodes and edges are streamed into the graph by these generators, in the order of the original
+	# one by one insertion, so the graph (and its layout) doesn't change
 	nodes_with_relations = set()
-	for name, rel in relations.items():
-		try:	# TODO: handle multiple classes
-			assert len(rel['Domain']) == 1, name
-			assert len(rel['Domain'][0]) == 1, name
-			assert len(rel['Range']) == 1, name
-			assert len(rel['Range'][0]) == 1, name
-		except AssertionError:
-			print(f"Skipping {name}")
-			continue
-
-		a = rel['Domain'][0][0]
-		b = rel['Range'][0][0]
-		graph.add_edge(a, b, color='blue', width=8, title=remove_prefixed_classes(f"{a} {name} {b}"))
-		nodes_with_relations.add(a)
-		nodes_with_relations.add(b)
-
-	# Load is-a relationships (inheritence)
-	for name, cls in entities.items():
-		for ancestor in cls['Ancestors']:
-			if any([
-					include_orphan_nodes,
-					name in nodes_with_relations,
-					ancestor in nodes_with_relations,
-				]):
-				if any([
-						name in nodes_with_relations,
-						ancestor in nodes_with_relations,
-					]):		
-					nodes_with_relations.add(name)
-					nodes_with_relations.add(ancestor)
-
-				graph.add_edge(name, ancestor, color='black', width=4, title=remove_prefixed_classes(f"{name} is-a {ancestor}"))
-				break # Only do first ancestor, this assumes order is perserved, I'm not sure it is.
-
-		# Load assertions
-		for assertion in cls['Assertions']:
-			nodes_with_relations.add(name)
-			nodes_with_relations.add(assertion['target'])
-			title = remove_prefixed_classes(f"<b> {name}</b> {assertion['property']} {assertion['cardinality']} <b> {assertion['target']}</b>")
-			graph.add_edge(name, assertion['target'], color='green', width=8, title=title)
-
-
-
-	# Load all nodes
-	colors = ['orange', 'yellow', 'purple', 'violet', 'blue', 'lime', 'grey', 'brown']
-	for name, cls in entities.items():	
-		if not (include_orphan_nodes or name in nodes_with_relations):
-			continue
+	def edges():
+		# Load other relationships (object properties)
+		for name, rel in relations.items():
+			try:	# TODO: handle multiple classes
+				assert len(rel['Domain']) == 1, name
+				assert len(rel['Domain'][0]) == 1, name
+				assert len(rel['Range']) == 1, name
+				assert len(rel['Range'][0]) == 1, name
+			except AssertionError:
+				print(f"Skipping {name}")
+				continue
 
-		graph.add_node(
-			name, 
-			label=name.split('.')[-1],
-			color=colors[len(cls['Ancestors'])],
-			title=(
-				f'<u>{remove_prefixed_classes(cls["Name"])}</u>'
-				f'<br>{cls["Definition"] if cls["Definition"] else ""}'
-			),
-			ancestors=cls['Ancestors'],
-			definition=cls['Definition'],
-			type="entity",
-			size=24,
-		)
-
-		# Load data properties
-		for data_property in cls['Data']:
-			# Get information
-			r = str(data_property["Range"])
-			r = r.replace('"', '')
-			r = r.replace("<", "&lt;").replace(">", "&gt;")
-			d = (data_property["Definition"] if data_property["Definition"] else "").replace('\n', '<br>')
-
-			# Get Color and Label
-			data_property_label = data_property['Name'].split('.')[-1]
-			data_property_color = "cyan"
-			if ('#important' in d) or ('# important' in d):
-				data_property_color = "red"
-				data_property_label = '#-' + data_property_label + '-#'
-			if len(list(data_property['Domain'])) > 1:
-				data_property_color = "black"
-				
-			# Add to graph
-			graph.add_node(
-				data_property['Name'],
-				label=data_property_label,
-				type="datatype",
-				domain=data_property['Domain'],
-				description=d,
-				title=(
-					f'<u>{remove_prefixed_classes(data_property["Name"])}</u>  {r}'
-					f'<br>'
-					f'{d}'
-				),
-				color=data_property_color,
-			)
-			graph.add_edge(
-				name, 
-				data_property['Name'],
-				color='brown',
-				title=remove_prefixed_classes(f"{name} has-a {data_property['Name']}"),
-			)
+			a = rel['Domain'][0][0]
+			b = rel['Range'][0][0]
+			nodes_with_relations.add(a)
+			nodes_with_relations.add(b)
+			yield a, b, {'color': 'blue', 'width': 8, 'title': title((a, b), "relation", a, name, b)}
+
+		# Load is-a relationships (inheritence)
+		for name, cls in entities.items():
+			for ancestor in cls['Ancestors']:
+				if include_orphan_nodes or name in nodes_with_relations or ancestor in nodes_with_relations:
+					if name in nodes_with_relations or ancestor in nodes_with_relations:
+						nodes_with_relations.add(name)
+						nodes_with_relations.add(ancestor)
+
+					yield name, ancestor, {'color': 'black', 'width': 4, 'title': title((name, ancestor), "is-a", name, ancestor)}
+					break # Only do first ancestor, this assumes order is perserved, I'm not sure it is.
+
+			# Load assertions
+			for assertion in cls['Assertions']:
+				target = assertion['target']
+				nodes_with_relations.add(name)
+				nodes_with_relations.add(target)
+				yield name, target, {
+					'color': 'green',
+					'width': 8,
+					'title': title((name, target), "assertion", name, assertion['property'], assertion['cardinality'], target),
+				}
+
+	data_edges = []
+	def nodes():
+		# Load all nodes
+		colors = ['orange', 'yellow', 'purple', 'violet', 'blue', 'lime', 'grey', 'brown']
+		for name, cls in entities.items():
+			if not (include_orphan_nodes or name in nodes_with_relations):
+				continue
 
+			yield name, {
+				'label': name.split('.')[-1],
+				'color': colors[min(len(cls['Ancestors']), len(colors) - 1)],
+				'title': title(name, "entity", cls["Name"], cls["Definition"]),
+				'ancestors': cls['Ancestors'],
+				'definition': cls['Definition'],
+				'type': "entity",
+				'size': 24,
+			}
+
+			# Load data properties
+			for data_property in cls['Data']:
+				# Get information
+				r = str(data_property["Range"])
+				r = r.replace('"', '')
+				r = r.replace("<", "&lt;").replace(">", "&gt;")
+				d = (data_property["Definition"] if data_property["Definition"] else "").replace('\n', '<br>')
+
+				# Get Color and Label
+				data_property_label = data_property['Name'].split('.')[-1]
+				data_property_color = "cyan"
+				if ('#important' in d) or ('# important' in d):
+					data_property_color = "red"
+					data_property_label = '#-' + data_property_label + '-#'
+				if len(list(data_property['Domain'])) > 1:
+					data_property_color = "black"
+
+				yield data_property['Name'], {
+					'label': data_property_label,
+					'type': "datatype",
+					'domain': data_property['Domain'],
+					'description': d,
+					'title': title(data_property['Name'], "datatype", data_property["Name"], r, d),
+					'color': data_property_color,
+				}
+				data_edges.append((name, data_property['Name'], {
+					'color': 'brown',
+					'title': title((name, data_property['Name']), "has-a", name, data_property['Name']),
+				}))
+
+	# Populate an empty graph, the nodes only once every edge is known (orphans are skipped)
+	graph = nx.Graph()
+	graph.add_edges_from(edges())
+	graph.add_nodes_from(nodes())
+	graph.add_edges_from(data_edges)
+	if pending:
+		graph.graph['pending_titles'] = pending
 	return graph
 
 if __name__ == '__main__':
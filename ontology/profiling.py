@@ -0,0 +1,190 @@
+""" Optional timing of the loading stages, eg: the owlready2 load, the ancestors or building the graph.
+
+	Profiling is off unless ONTOLOGY_PROFILE is set or profile() is used, stage() and profiled() then do
+	nothing. ONTOLOGY_PROFILE=log logs a report when the program exits, ONTOLOGY_PROFILE=report.json writes
+	it as json. ONTOLOGY_PROFILE_CAPTURE=cprofile,tracemalloc also reports the slowest functions and the
+	memory each stage allocated. Stages run in worker processes (jobs) aren't reported. Profilers nest, the
+	stages run under profile() are also reported by a profiler that was already running.
+"""
+
+import os
+import json
+import time
+import atexit
+import logging
+import cProfile
+import pstats
+import tracemalloc
+from functools import wraps
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+
+class Profiler:
+	""" Adds up the calls, wall time and (with memory) allocated bytes of every stage, then reports them to sink.
+
+		The stages are also added to parent, the profiler that was running when this one was enabled.
+	"""
+	def __init__(self, sink, cprofile: bool=False, memory: bool=False, functions: int=30, parent=None):
+		self.sink = sink
+		self.parent = parent
+		self.stages = {}
+		self.cprofile = cProfile.Profile() if cprofile else None
+		self.memory = memory
+		self.functions = functions
+		self._tracing = False
+
+	def start(self):
+		if self.memory and not tracemalloc.is_tracing():
+			tracemalloc.start()
+			self._tracing = True
+		if self.cprofile is not None:
+			# Only one cProfile can run at a time, the parent's misses the functions run while this one is
+			if self.parent is not None and self.parent.cprofile is not None:
+				self.parent.cprofile.disable()
+			self.cprofile.enable()
+		self.started = time.perf_counter()
+
+	def stop(self):
+		""" Stops capturing and sends the report to the sink. """
+		wall = time.perf_counter() - self.started
+		if self.cprofile is not None:
+			self.cprofile.disable()
+			if self.parent is not None and self.parent.cprofile is not None:
+				self.parent.cprofile.enable()
+		if self._tracing:
+			tracemalloc.stop()
+		report = self.report(wall)
+		self.sink(report)
+		return report
+
+	@contextmanager
+	def stage(self, name):
+		# A parent may capture memory when this profiler doesn't
+		tracing = tracemalloc.is_tracing()
+		allocated = tracemalloc.get_traced_memory()[0] if tracing else 0
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			wall = time.perf_counter() - start
+			memory = tracemalloc.get_traced_memory()[0] - allocated if tracing else 0
+			profiler = self
+			while profiler is not None:
+				profiler.add(name, wall, memory)
+				profiler = profiler.parent
+
+	def add(self, name, wall, memory=0):
+		stats = self.stages.setdefault(name, {"calls": 0, "wall": 0.0, **({"memory": 0} if self.memory else {})})
+		stats["calls"] += 1
+		stats["wall"] += wall
+		if self.memory:
+			stats["memory"] += memory
+
+	def report(self, wall):
+		report = {"wall": wall, "stages": self.stages}
+		if self.cprofile is not None:
+			stats = pstats.Stats(self.cprofile).stats
+			slowest = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:self.functions]
+			report["functions"] = [
+				{"function": f"{file}:{line}({function})", "calls": calls, "total": total, "cumulative": cumulative}
+				for (file, line, function), (_, calls, total, cumulative, _) in slowest
+			]
+		return report
+
+
+def log_sink(report):
+	logger.info("Profiled %.3fs", report["wall"])
+	for name, stats in sorted(report["stages"].items(), key=lambda item: item[1]["wall"], reverse=True):
+		memory = f", {stats['memory'] / 2**20:.1f} MiB" if "memory" in stats else ""
+		logger.info("  %s: %.3fs in %d calls%s", name, stats["wall"], stats["calls"], memory)
+	for function in report.get("functions", []):
+		logger.info("  %.3fs (%.3fs own) in %d calls %s", function["cumulative"], function["total"], function["calls"], function["function"])
+
+
+class JsonSink:
+	def __init__(self, path):
+		self.path = path
+
+	def __call__(self, report):
+		with open(self.path, 'w') as f:
+			json.dump(report, f, indent=4)
+
+
+def get_sink(sink):
+	""" sink is a callable taking the report, "log" or the path of a json file. """
+	if callable(sink):
+		return sink
+	if sink in ("log", "1"):
+		return log_sink
+	return JsonSink(sink)
+
+
+_profiler = None
+_disabled = nullcontext()
+
+
+def stage(name):
+	""" Context manager timing a stage, eg: with stage("owl_to_json.load"): ... """
+	return _disabled if _profiler is None else _profiler.stage(name)
+
+
+def profiled(name=None):
+	""" Decorator timing every call of a function as a stage, named after the function by default. """
+	def decorate(function):
+		label = name or function.__qualname__
+		@wraps(function)
+		def wrapper(*args, **kwargs):
+			if _profiler is None:
+				return function(*args, **kwargs)
+			with _profiler.stage(label):
+				return function(*args, **kwargs)
+		return wrapper
+	return decorate
+
+
+def enable(sink="log", cprofile: bool=False, memory: bool=False):
+	""" Starts profiling, reporting to sink when disable() is called. A profiler that is already running
+		keeps running and also gets the stages, until this one is disabled.
+	"""
+	global _profiler
+	_profiler = Profiler(get_sink(sink), cprofile, memory, parent=_profiler)
+	_profiler.start()
+	return _profiler
+
+
+def disable():
+	""" Stops the last enabled profiler and returns the report sent to its sink, None if none was enabled. """
+	global _profiler
+	profiler = _profiler
+	if profiler is None:
+		return None
+	_profiler = profiler.parent
+	return profiler.stop()
+
+
+def disable_all():
+	while _profiler is not None:
+		disable()
+
+
+@contextmanager
+def profile(sink="log", cprofile: bool=False, memory: bool=False):
+	""" Profiles the stages run in the block, eg: with profile("report.json"): Ontology.from_owl_file(...) """
+	profiler = enable(sink, cprofile, memory)
+	try:
+		yield profiler
+	finally:
+		if _profiler is profiler:
+			disable()
+
+
+if os.environ.get("ONTOLOGY_PROFILE"):
+	if not logging.getLogger().handlers:
+		# Nothing configured logging, so the log sink would be silent
+		logger.addHandler(logging.StreamHandler())
+		logger.setLevel(logging.INFO)
+	capture = os.environ.get("ONTOLOGY_PROFILE_CAPTURE", "").split(",")
+	enable(os.environ["ONTOLOGY_PROFILE"], "cprofile" in capture, "tracemalloc" in capture)
+	atexit.register(disable_all)
@@ -0,0 +1,34 @@
+""" Reads the restrictions out of owlready2 class expressions, eg: Parent & (owns.some(Product)). """
+
+from owlready2 import And, Restriction, EXACTLY, MIN, MAX, HAS_SELF
+from owlready2.class_construct import _restriction_type_2_label
+
+
+def restrictions(expression):
+	""" Yields every restriction of a class expression, in order, looking inside intersections. """
+	stack = [expression]
+	while stack:
+		expression = stack.pop()
+		if isinstance(expression, Restriction):
+			yield expression
+		elif isinstance(expression, And):
+			stack.extend(reversed(expression.Classes))
+
+
+def assertion(restriction):
+	""" Returns (property, cardinality, target) of a restriction.
+
+		cardinality and target are written as in owlready2's rendering, eg: owns.exactly(2, Product)
+		gives (owns, "exactly 2", "Product").
+	"""
+	label = _restriction_type_2_label[restriction.type]
+	if restriction.type == HAS_SELF:
+		return restriction.property, label, ""
+	if restriction.type in (EXACTLY, MIN, MAX):
+		return restriction.property, f"{label} {restriction.cardinality}", repr(restriction.value)
+	return restriction.property, label, repr(restriction.value)
+
+
+def assertions(cls):
+	""" Returns (property, cardinality, target) for every restriction of the classes cls is equivalent to. """
+	return [assertion(r) for clause in cls.equivalent_to for r in restrictions(clause)]
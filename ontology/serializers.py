@@ -0,0 +1,464 @@
+""" Writes graphs to disk and reads them back without holding the whole file in memory. """
+
+import gzip
+import json
+import numpy as np
+import networkx as nx
+
+
+def _open(path, mode, compress=None):
+	""" Opens path as text, gzipped when compress is set or the path ends with .gz. """
+	if compress is None:
+		compress = str(path).endswith(".gz")
+	if compress:
+		return gzip.open(path, mode + "t", encoding="utf-8")
+	return open(path, mode, encoding="utf-8")
+
+
+def write_node_link_json(graph, path, indent: int=4, compress: bool=None, edges: str="links"):
+	""" Writes the graph in networkx's node-link format, one node and one link at a time.
+
+		This gives the same file as json.dump(nx.node_link_data(graph), f, indent=indent) without building
+		the node_link_data dict first. indent=None writes a compact file with one node or link per line.
+		The links are stored under `edges`, "links" is what networkx used before 3.4.
+	"""
+	if indent is None:
+		encode = json.JSONEncoder(separators=(",", ":")).encode
+		dumps = lambda value, depth: encode(value)
+		line = lambda depth: "\n" if depth == 2 else ""
+		colon = ":"
+	else:
+		encode = json.JSONEncoder(indent=indent).encode
+		scalar = json.JSONEncoder().encode  # Scalars go through the C encoder, indenting is done in python
+		def dumps(value, depth):
+			pad = " " * (depth + 1) * indent
+			if not isinstance(value, dict) or not value or not all(isinstance(key, str) for key in value):
+				return encode(value).replace("\n", "\n" + pad[indent:])
+			return "{\n" + ",\n".join(
+				pad + scalar(key) + ": " + (encode(v).replace("\n", "\n" + pad) if isinstance(v, (dict, list, tuple)) and v else scalar(v))
+				for key, v in value.items()
+			) + "\n" + pad[indent:] + "}"
+		line = lambda depth: "\n" + " " * depth * indent
+		colon = ": "
+
+	if graph.is_multigraph():
+		links = ({**d, "source": u, "target": v, "key": k} for u, v, k, d in graph.edges(keys=True, data=True))
+	else:
+		links = ({**d, "source": u, "target": v} for u, v, d in graph.edges(data=True))
+	fields = [
+		("directed", graph.is_directed()),
+		("multigraph", graph.is_multigraph()),
+		("graph", graph.graph),
+		("nodes", ({**data, "id": node} for node, data in graph.nodes(data=True))),
+		(edges, links),
+	]
+
+	with _open(path, "w", compress) as f:
+		f.write("{")
+		for i, (key, value) in enumerate(fields):
+			f.write(("," if i else "") + line(1) + json.dumps(key) + colon)
+			if i < 3:
+				f.write(dumps(value, 1))
+				continue
+
+			# Stream the nodes and links, a batch of items per write
+			f.write("[")
+			separator = line(2)
+			batch = []
+			for item in value:
+				batch.append(dumps(item, 2))
+				if len(batch) == 1024:
+					f.write(separator + ("," + line(2)).join(batch))
+					separator = "," + line(2)
+					batch = []
+			if batch:
+				f.write(separator + ("," + line(2)).join(batch))
+			f.write("]" if separator == line(2) and not batch else line(1) + "]")
+		f.write(line(0) + "}")
+
+	return path
+
+
+class _StreamingDecoder:
+	""" Decodes JSON values one at a time from a file, reading it in chunks. """
+	CHUNK_SIZE = 1 << 16
+
+	def __init__(self, f):
+		self.f = f
+		self.buffer = ""
+		self.position = 0
+		self.eof = False
+		self.decoder = json.JSONDecoder()
+
+	def _fill(self):
+		chunk = self.f.read(self.CHUNK_SIZE)
+		self.buffer = self.buffer[self.position:] + chunk
+		self.position = 0
+		self.eof = not chunk
+		return bool(chunk)
+
+	def peek(self, skip=" \t\r\n"):
+		""" Skips whitespace (and `skip`) and returns the next character, "" at the end of the file. """
+		while True:
+			while self.position < len(self.buffer) and self.buffer[self.position] in skip:
+				self.position += 1
+			if self.position < len(self.buffer) or not self._fill():
+				return self.buffer[self.position:self.position + 1]
+
+	def expect(self, character, skip=" \t\r\n"):
+		found = self.peek(skip)
+		if found != character:
+			raise ValueError(f"Expected {character!r} but found {found!r}")
+		self.position += 1
+
+	def value(self):
+		self.peek()
+		while True:
+			try:
+				value, end = self.decoder.raw_decode(self.buffer, self.position)
+				if end < len(self.buffer) or self.eof:  # A number could continue in the next chunk
+					self.position = end
+					return value
+			except json.JSONDecodeError:
+				if self.eof:
+					raise
+			self._fill()
+
+
+def iter_node_link_json(path, compress: bool=None):
+	""" Yields the contents of a node-link json file without loading it all at once.
+
+		Yields (key, value) for the top level fields ("directed", "multigraph", "graph"),
+		then ("node", node_dict) and ("link", link_dict) for every node and link.
+	"""
+	with _open(path, "r", compress) as f:
+		decoder = _StreamingDecoder(f)
+		decoder.expect("{")
+		while decoder.peek(" \t\r\n,") != "}":
+			key = decoder.value()
+			decoder.expect(":")
+			if key in ("nodes", "links", "edges"):
+				kind = "node" if key == "nodes" else "link"
+				decoder.expect("[")
+				while decoder.peek(" \t\r\n,") != "]":
+					yield kind, decoder.value()
+				decoder.expect("]")
+			else:
+				yield key, decoder.value()
+
+
+def read_node_link_json(path, compress: bool=None):
+	""" Builds a networkx graph from a node-link json file, one node and one link at a time.
+
+		Reads files written by write_node_link_json or json.dump(nx.node_link_data(graph)).
+	"""
+	header = {"directed": False, "multigraph": False, "graph": {}}
+	graph = None
+	for kind, value in iter_node_link_json(path, compress):
+		if kind not in ("node", "link"):
+			header[kind] = value
+			continue
+
+		if graph is None:
+			graph = _empty_graph(header)
+
+		if kind == "node":
+			node = _node_id(value.pop("id"))
+			graph.add_node(node, **value)
+		elif header["multigraph"]:
+			graph.add_edge(_node_id(value.pop("source")), _node_id(value.pop("target")), key=value.pop("key", None), **value)
+		else:
+			graph.add_edge(_node_id(value.pop("source")), _node_id(value.pop("target")), **value)
+
+	return _empty_graph(header) if graph is None else graph
+
+
+def _empty_graph(header):
+	if header["directed"]:
+		graph = nx.MultiDiGraph() if header["multigraph"] else nx.DiGraph()
+	else:
+		graph = nx.MultiGraph() if header["multigraph"] else nx.Graph()
+	graph.graph.update(header["graph"])
+	return graph
+
+
+def _node_id(value):
+	""" json turns tuples into lists, node ids are hashable so every list was a tuple. """
+	return tuple(map(_node_id, value)) if isinstance(value, list) else value
+
+
+class _StringTable:
+	""" Strings packed into one utf-8 byte array, string i is data[offsets[i]:offsets[i + 1]]. """
+
+	def __init__(self, offsets, data):
+		self.offsets = offsets
+		self.data = data
+
+	@classmethod
+	def from_strings(cls, strings):
+		encoded = [s.encode("utf-8") for s in strings]
+		offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+		np.cumsum([len(e) for e in encoded], out=offsets[1:])
+		return cls(offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+	def __len__(self):
+		return len(self.offsets) - 1
+
+	def __getitem__(self, i):
+		return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+	def decode_all(self):
+		raw = bytes(self.data)
+		offsets = self.offsets.tolist()
+		return [raw[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+class CSRGraph:
+	""" A graph stored as flat numpy arrays, for saving and loading large graphs quickly.
+
+		Node i is names[i]. The targets of node i's edges are indices[indptr[i]:indptr[i + 1]] (compressed sparse
+		rows), an undirected edge is stored once. Attribute values are interned: each attribute is a column of
+		int32 indices into the values table, -1 where a node or edge doesn't have it, and every distinct value is
+		stored once as json. On disk everything is one file that can be memory-mapped, so opening a graph only
+		reads what is used.
+	"""
+	MAGIC = b"CSRGRAPH"
+	VERSION = 1
+	ALIGNMENT = 64
+
+	def __init__(self, names, indptr, indices, values, node_attributes=None, edge_attributes=None,
+			directed: bool=True, multigraph: bool=False, graph: dict=None, json_names: bool=False):
+		self.names = names  # _StringTable of node ids
+		self.indptr = indptr
+		self.indices = indices
+		self.values = values  # _StringTable of json encoded attribute values
+		self.node_attributes = node_attributes or {}
+		self.edge_attributes = edge_attributes or {}
+		self.directed = directed
+		self.multigraph = multigraph
+		self.graph = graph or {}
+		self.json_names = json_names  # Node ids that aren't strings are stored as json
+		self._values = None
+
+	def __len__(self):
+		return len(self.indptr) - 1
+
+	@property
+	def number_of_edges(self):
+		return len(self.indices)
+
+	@property
+	def sources(self):
+		""" The source node of every edge, in the same order as indices. """
+		return np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.indptr))
+
+	def nodes(self):
+		names = self.names.decode_all()
+		return [_node_id(json.loads(name)) for name in names] if self.json_names else names
+
+	def value(self, i):
+		""" Decodes one entry of the values table. """
+		if self._values is None:
+			self._values = {}
+		if i not in self._values:
+			self._values[i] = json.loads(self.values[i])
+		return self._values[i]
+
+	def node_attribute(self, key):
+		""" Returns one attribute for every node, None where a node doesn't have it. """
+		return self._decode_column(self.node_attributes[key])
+
+	def edge_attribute(self, key):
+		""" Returns one attribute for every edge, in the same order as indices. """
+		return self._decode_column(self.edge_attributes[key])
+
+	def _decode_column(self, column):
+		column = np.asarray(column)
+		distinct = np.unique(column[column >= 0])
+		decoded = dict(zip(distinct.tolist(), (self.value(i) for i in distinct.tolist())))
+		return [decoded.get(i) for i in column.tolist()]
+
+	@classmethod
+	def from_networkx(cls, graph, attributes: bool=True):
+		""" Converts a networkx graph, attributes=False keeps only the structure. """
+		nodes = list(graph)
+		index = {node: i for i, node in enumerate(nodes)}
+		json_names = not all(isinstance(node, str) for node in nodes)
+
+		# Intern every attribute value, keyed by type so that 1 and True stay apart
+		interned = {}
+		def intern(value):
+			key = (type(value), value) if isinstance(value, (str, int, float, bool, type(None))) else (list, json.dumps(value))
+			if key not in interned:
+				interned[key] = (len(interned), value)
+			return interned[key][0]
+
+		def columns(records, length):
+			result = {}
+			if not attributes:
+				return result
+			for i, data in enumerate(records):
+				for key, value in data.items():
+					if key not in result:
+						result[key] = np.full(length, -1, dtype=np.int32)
+					result[key][i] = intern(value)
+			return result
+
+		if not attributes and graph.is_directed() and not graph.is_multigraph():
+			# Structure only, read the adjacency directly
+			indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+			np.cumsum([len(successors) for successors in graph.adj.values()], out=indptr[1:])
+			indices = np.fromiter((index[v] for successors in graph.adj.values() for v in successors), dtype=np.int32, count=indptr[-1])
+			return cls(
+				names=_StringTable.from_strings(json.dumps(node) for node in nodes) if json_names else _StringTable.from_strings(nodes),
+				indptr=indptr,
+				indices=indices,
+				values=_StringTable.from_strings([]),
+				graph=dict(graph.graph),
+				json_names=json_names,
+			)
+
+		if graph.is_multigraph():
+			edges = [(u, v, {**d, "key": k}) for u, v, k, d in graph.edges(keys=True, data=True)]
+		else:
+			edges = list(graph.edges(data=True))
+		sources = np.array([index[u] for u, _, _ in edges], dtype=np.int32)
+		targets = np.array([index[v] for _, v, _ in edges], dtype=np.int32)
+		order = np.argsort(sources, kind="stable")  # Edges already come grouped by source, this keeps it safe
+		node_columns = columns((data for _, data in graph.nodes(data=True)), len(nodes))
+		edge_columns = columns((edges[i][2] for i in order.tolist()), len(edges))
+
+		indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+		np.cumsum(np.bincount(sources, minlength=len(nodes)), out=indptr[1:])
+		return cls(
+			names=_StringTable.from_strings(json.dumps(node) for node in nodes) if json_names else _StringTable.from_strings(nodes),
+			indptr=indptr,
+			indices=targets[order],
+			values=_StringTable.from_strings(json.dumps(value) for _, value in interned.values()),
+			node_attributes=node_columns,
+			edge_attributes=edge_columns,
+			directed=graph.is_directed(),
+			multigraph=graph.is_multigraph(),
+			graph=dict(graph.graph),
+			json_names=json_names,
+		)
+
+	def to_networkx(self):
+		names = self.nodes()
+		if self.directed:
+			graph = nx.MultiDiGraph() if self.multigraph else nx.DiGraph()
+		else:
+			graph = nx.MultiGraph() if self.multigraph else nx.Graph()
+		graph.graph.update(self.graph)
+
+		values = [json.loads(value) for value in self.values.decode_all()]
+		def records(columns, length):
+			columns = {key: np.asarray(column).tolist() for key, column in columns.items()}
+			data = [{} for _ in range(length)]
+			for key, column in columns.items():
+				for i, v in enumerate(column):
+					if v >= 0:
+						data[i][key] = values[v]
+			return data
+
+		graph.add_nodes_from(zip(names, records(self.node_attributes, len(names))))
+		edge_data = records(self.edge_attributes, self.number_of_edges)
+		sources, targets = self.sources.tolist(), np.asarray(self.indices).tolist()
+		if self.multigraph:
+			graph.add_edges_from((names[u], names[v], d.pop("key"), d) for u, v, d in zip(sources, targets, edge_data))
+		else:
+			graph.add_edges_from((names[u], names[v], d) for u, v, d in zip(sources, targets, edge_data))
+		return graph
+
+	def _arrays(self):
+		arrays = {
+			"indptr": self.indptr,
+			"indices": self.indices,
+			"names.offsets": self.names.offsets,
+			"names.data": self.names.data,
+			"values.offsets": self.values.offsets,
+			"values.data": self.values.data,
+		}
+		arrays.update({f"node.{key}": column for key, column in self.node_attributes.items()})
+		arrays.update({f"edge.{key}": column for key, column in self.edge_attributes.items()})
+		return arrays
+
+	def write(self, path):
+		""" Writes the graph as: magic, header length, json header, then each array aligned to 64 bytes.
+			Array offsets in the header are relative to the end of the header.
+		"""
+		arrays = {name: np.ascontiguousarray(array) for name, array in self._arrays().items()}
+		layout, size = {}, 0
+		for name, array in arrays.items():
+			layout[name] = [array.dtype.str, list(array.shape), size]
+			size += self._aligned(array.nbytes)
+
+		header = json.dumps({
+			"version": self.VERSION,
+			"directed": self.directed,
+			"multigraph": self.multigraph,
+			"graph": self.graph,
+			"json_names": self.json_names,
+			"arrays": layout,
+		}).encode()
+		start = self._aligned(len(self.MAGIC) + 8 + len(header))
+
+		with open(path, "wb") as f:
+			f.write(self.MAGIC)
+			f.write(len(header).to_bytes(8, "little"))
+			f.write(header)
+			for name, array in arrays.items():
+				f.seek(start + layout[name][2])
+				f.write(array.tobytes())
+			f.truncate(start + size)
+		return path
+
+	@classmethod
+	def _aligned(cls, size):
+		return -(-size // cls.ALIGNMENT) * cls.ALIGNMENT
+
+	@classmethod
+	def read(cls, path, mmap: bool=True):
+		""" Opens a graph written by write(), the arrays are memory-mapped unless mmap is False. """
+		with open(path, "rb") as f:
+			if f.read(len(cls.MAGIC)) != cls.MAGIC:
+				raise ValueError(f"{path} is not a CSRGraph file")
+			header_size = int.from_bytes(f.read(8), "little")
+			header = json.loads(f.read(header_size))
+		start = cls._aligned(len(cls.MAGIC) + 8 + header_size)
+		if header["version"] != cls.VERSION:
+			raise ValueError(f"{path} is version {header['version']}, expected {cls.VERSION}")
+
+		arrays = {}
+		for name, (dtype, shape, offset) in header["arrays"].items():
+			offset += start
+			count = int(np.prod(shape))
+			if count == 0:
+				arrays[name] = np.empty(shape, dtype=dtype)
+			elif mmap:
+				arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=tuple(shape))
+			else:
+				arrays[name] = np.fromfile(path, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+		return cls(
+			names=_StringTable(arrays["names.offsets"], arrays["names.data"]),
+			indptr=arrays["indptr"],
+			indices=arrays["indices"],
+			values=_StringTable(arrays["values.offsets"], arrays["values.data"]),
+			node_attributes={name[len("node."):]: a for name, a in arrays.items() if name.startswith("node.")},
+			edge_attributes={name[len("edge."):]: a for name, a in arrays.items() if name.startswith("edge.")},
+			directed=header["directed"],
+			multigraph=header["multigraph"],
+			graph=header["graph"],
+			json_names=header["json_names"],
+		)
+
+
+def write_graph_binary(graph, path):
+	""" Writes a networkx graph as a CSRGraph file. """
+	return CSRGraph.from_networkx(graph).write(path)
+
+
+def read_graph_binary(path, mmap: bool=True):
+	""" Reads a CSRGraph file back into a networkx graph. """
+	return CSRGraph.read(path, mmap).to_networkx()
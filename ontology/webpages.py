@@ -4,6 +4,40 @@ from owlready2 import *
 from pyvis.network import Network
 import networkx as nx
 import webbrowser as wb
+import re
+import json
+import math
+from pathlib import Path
+from functools import partial
+from collections import Counter
+import ontology.clustering as clustering
+import ontology.cache as cache
+from ontology.layouts import force_layout
+
+
+# Renders the titles (tooltips) of the nodes and edges as html rather than text
+MAKE_HTML_INJECTION = """\t\tfunction make_html(html) {const container = document.createElement("div"); container.innerHTML = html; return container;}; nodes.forEach(function(node) {node.title = make_html(node.title)});edges.forEach(function(edge) {edge.title = make_html(edge.title)});\n"""
+EDGES_LINE = re.compile(r"\n[ \t]*edges = new vis\.DataSet\([^\n]*\n")
+
+
+def inject_make_html(html):
+	""" Adds MAKE_HTML_INJECTION after the line of the page declaring the edges. """
+	match = EDGES_LINE.search(html)
+	if match is None:
+		raise ValueError("The pyvis page has no 'edges = new vis.DataSet(' line to add make_html after")
+	return html[:match.end()] + MAKE_HTML_INJECTION + html[match.end():]
+
+
+class TitleNetwork(Network):
+	""" A pyvis Network whose page renders the html titles, so it is written in one pass. """
+	scripts = ""  # Html added at the end of the page's body
+
+	def generate_html(self, name="index.html", local=True, notebook=False):
+		html = inject_make_html(super().generate_html(name, local, notebook))
+		if self.scripts:
+			start, body_end, end = html.rpartition("</body>")
+			html = start + self.scripts + body_end + end
+		return html
 
 
 class OntologyVisualizer:
@@ -18,31 +52,193 @@ class OntologyVisualizer:
 		}
 	}
 
-	def __init__(self, physics_options: dict=None):
+	STATIC_OPTIONS = {"physics": {"enabled": False}, "edges": {"smooth": False}}
+
+	def __init__(self, physics_options: dict=None, static_layout: bool=False, spacing: float=60.0):
+		""" static_layout lays the graph out here (ontology.layouts.force_layout, cached by the structure of the
+			graph) and turns the physics off, so the browser draws it right away instead of simulating it.
+			spacing is about the distance between neighbouring nodes in pixels.
+		"""
 		self.physics_options = self.DEFAULT_HTML_PHYSICS_OPTIONS if physics_options is None else physics_options
+		self.static_layout = static_layout
+		self.spacing = spacing
 		
 	def create_html(self, graph, write_path, show:bool=False):
-		# Create the basic html File
-		nt = Network('100vh', '100%', directed=True)
-		nt.from_nx(graph)
-		nt.set_options(f"var options = {self.physics_options}".replace("'", '"'))
+		# Create the html file, the custom code is added to the page before pyvis writes it
+		nt = TitleNetwork('100vh', '100%', directed=True)
+		nt.from_nx(graph.copy())  # from_nx sets the size of the nodes and width of the edges of the graph it is given
+		if self.static_layout:
+			self._place(nt, graph)
+			nt.set_options(f"var options = {json.dumps(self.STATIC_OPTIONS)}")
+		else:
+			nt.set_options(f"var options = {self.physics_options}".replace("'", '"'))
 		nt.write_html(str(write_path))
 
-		# Inject custom code
-		make_html_injection = """\t\tfunction make_html(html) {const container = document.createElement("div"); container.innerHTML = html; return container;}; nodes.forEach(function(node) {node.title = make_html(node.title)});edges.forEach(function(edge) {edge.title = make_html(edge.title)});\n"""
-		text = open(write_path).readlines()
-		for i, line in enumerate(text):
-			if line.strip().startswith("edges = new vis.DataSet([{"):
-				break
-		text.insert(i+1, make_html_injection)
-		open(write_path, 'w').writelines(text)
-		
 		# Display to user
 		if show:
 			wb.open(write_path)
 
 		return write_path
 
+	def _place(self, nt, graph):
+		""" Sets the x and y of the pyvis nodes, the force layout is in [-1, 1] so it is scaled with the size of the graph. """
+		positions = cache.default_layouts.layout(graph)
+		scale = self.spacing * math.sqrt(len(graph))
+		for node in nt.nodes:
+			x, y = positions[node['id']]
+			node['x'], node['y'] = round(float(x) * scale, 1), round(float(y) * scale, 1)
+
+
+class ClusteredVisualizer:
+	""" Draws graphs too large for the physics of OntologyVisualizer: nodes are collapsed into clusters
+		(see ontology.clustering) on a layout computed beforehand, and double clicking a cluster expands it.
+
+		The members of each cluster are written to their own script next to the page (eg: graph.html gets
+		graph.clusters/3.js), which is only loaded when the cluster is expanded. They are scripts rather than
+		json so they also load when the page is opened from the disk.
+	"""
+	OPTIONS = {
+		"physics": {"enabled": False},
+		"edges": {"smooth": False},
+		"interaction": {"hideEdgesOnDrag": True, "tooltipDelay": 200},
+	}
+	COLOR = "#97c2fc"  # pyvis' default
+	NODE_ATTRIBUTES = ("label", "title", "color", "size", "shape")
+	EDGE_ATTRIBUTES = ("color", "width", "title")
+
+	# Expands a cluster when its fragment is loaded: its node is replaced by its members, and the edges
+	# go to the members of expanded clusters or to the node of collapsed ones
+	EXPAND_SCRIPT = """
+		<script>
+		var clusterDirectory = %s;
+		var expandedClusters = %s;
+		function clusterHtml(html) {const container = document.createElement("div"); container.innerHTML = html; return container;}
+		function clusterEndpoint(id, cluster) {return expandedClusters[cluster] ? id : "cluster:" + cluster;}
+		function clusterLoaded(cluster, fragment) {
+			var clusterId = "cluster:" + cluster;
+			expandedClusters[cluster] = true;
+			edges.remove(edges.getIds({filter: function(edge) {return edge.from === clusterId || edge.to === clusterId;}}));
+			nodes.remove(clusterId);
+			fragment.nodes.forEach(function(node) {if (node.title) {node.title = clusterHtml(node.title);}});
+			nodes.add(fragment.nodes);
+			fragment.edges.forEach(function(edge) {
+				var from = clusterEndpoint(edge.from, edge.from_cluster), to = clusterEndpoint(edge.to, edge.to_cluster);
+				var id = JSON.stringify([from, to]);
+				if (edges.get(id) === null) {
+					edges.add(Object.assign({}, edge, {id: id, from: from, to: to, arrows: "to", title: edge.title ? clusterHtml(edge.title) : undefined}));
+				}
+			});
+		}
+		network.on("doubleClick", function(params) {
+			params.nodes.forEach(function(id) {
+				if (typeof id === "string" && id.startsWith("cluster:") && !expandedClusters[id.slice(8)]) {
+					var script = document.createElement("script");
+					script.src = clusterDirectory + "/" + id.slice(8) + ".js";
+					document.body.appendChild(script);
+				}
+			});
+		});
+		</script>
+	"""
+
+	def __init__(self, by: str="module", seed: int=0, static_layout: bool=False, **options):
+		""" by is how the nodes are clustered, one of ontology.clustering.CLUSTERINGS, with its options (eg: depth).
+			The page is always laid out beforehand, static_layout also caches the layout of the clusters by the
+			structure of their graph, as OntologyVisualizer does.
+		"""
+		if by == "community":
+			options.setdefault("seed", seed)
+		self.cluster = partial(clustering.CLUSTERINGS[by], **options)
+		self.seed = seed
+		self.layout = cache.default_layouts.layout if static_layout else force_layout
+
+	def create_html(self, graph, write_path, show: bool=False):
+		write_path = Path(write_path)
+		clusters = self.cluster(graph)
+		collapsed = clustering.collapse(graph, clusters)
+		centers, positions = clustering.layout(graph, collapsed, seed=self.seed, layout=self.layout)
+
+		# Clusters are numbered, a single node is drawn as itself
+		number = {cluster: i for i, cluster in enumerate(collapsed)}
+		single = {cluster for cluster, size in collapsed.nodes(data='size') if size == 1}
+		def endpoint(cluster):
+			return collapsed.nodes[cluster]['members'][0] if cluster in single else f"cluster:{number[cluster]}"
+
+		nodes = []
+		for cluster, data in collapsed.nodes(data=True):
+			if cluster in single:
+				nodes.append(self._node(graph, data['members'][0], centers[cluster]))
+				continue
+
+			x, y = centers[cluster].tolist()
+			colors = Counter(graph.nodes[member].get('color') for member in data['members'])
+			nodes.append({
+				"id": endpoint(cluster),
+				"label": f"{cluster} ({data['size']})",
+				"title": f"<b>{cluster}</b><br>{data['size']} nodes, double click to expand",
+				"color": colors.most_common(1)[0][0] or self.COLOR,
+				"size": 10 + 2 * math.sqrt(data['size']),
+				"shape": "dot",
+				"x": x,
+				"y": y,
+			})
+		edges = [
+			{"from": endpoint(a), "to": endpoint(b), "arrows": "to", "width": 1 + math.log2(weight), "title": f"{weight} edges"}
+			for a, b, weight in collapsed.edges(data='weight')
+		]
+
+		# pyvis' add_node and add_edge scan all the nodes for duplicates, so the page's are set directly
+		nt = TitleNetwork('100vh', '100%', directed=True)
+		nt.nodes, nt.edges = nodes, edges
+		nt.set_options(json.dumps(self.OPTIONS))
+		directory = write_path.with_name(f"{write_path.stem}.clusters")
+		nt.scripts = self.EXPAND_SCRIPT % (json.dumps(directory.name), json.dumps({number[c]: True for c in single}))
+		nt.write_html(str(write_path))
+		self._write_fragments(graph, collapsed, clusters, number, positions, directory, single)
+
+		if show:
+			wb.open(str(write_path))
+
+		return write_path
+
+	def _write_fragments(self, graph, collapsed, clusters, number, positions, directory, single):
+		directory.mkdir(parents=True, exist_ok=True)
+		for cluster, members in collapsed.nodes(data='members'):
+			if cluster in single:
+				continue
+
+			nodes = [self._node(graph, node, positions[node]) for node in members]
+
+			# Every edge of the members
+			edges = []
+			seen = set()
+			incident = [*graph.edges(members), *graph.in_edges(members)] if graph.is_directed() else graph.edges(members)
+			for u, v in incident:
+				key = (u, v) if graph.is_directed() else frozenset((u, v))
+				if key in seen:
+					continue
+				seen.add(key)
+				edges.append({
+					"from": u,
+					"to": v,
+					"from_cluster": number[clusters[u]],
+					"to_cluster": number[clusters[v]],
+					**self._attributes(graph.edges[u, v], self.EDGE_ATTRIBUTES),
+				})
+
+			with open(directory / f"{number[cluster]}.js", 'w') as f:
+				f.write(f"clusterLoaded({number[cluster]}, {json.dumps({'nodes': nodes, 'edges': edges}, default=str)});\n")
+
+	def _node(self, graph, node, position):
+		x, y = position.tolist()
+		return {"id": node, "x": x, "y": y, **self._attributes(graph.nodes[node], self.NODE_ATTRIBUTES, label=str(node), shape="dot", color=self.COLOR)}
+
+	@staticmethod
+	def _attributes(data, keys, **defaults):
+		""" The attributes vis.js draws, eg: a node's ancestors are left out. """
+		return {**defaults, **{key: data[key] for key in keys if data.get(key) is not None}}
+
+
 class OntologyDocumentation:
 	DEFAULT_TITLE = "Ontology Documentation"
 	PAGE_START = lambda self: f"""
@@ -126,85 +322,129 @@ class OntologyDocumentation:
 	def __init__(self, title: str=DEFAULT_TITLE):
 		self.title = title 
 
-	def create_html(self, graph, write_path, show: bool=False):
-		lines = [
-			*self._table_of_contents(graph),
-			*self._entities(graph),
-		]
+	def create_html(self, graph, write_path, show: bool=False, split: bool=False):
+		""" Writes the page section by section as it is rendered, rather than holding all of it in memory.
 
-		with open(write_path, 'w') as f:
-			f.write(self.PAGE_START())
-			f.writelines(lines)
-			f.write(self.PAGE_END())
+			split writes one page per module next to write_path (eg: docs.html gets docs.small.html) and
+			makes write_path an index of them, so no single page holds the whole ontology.
+		"""
+		if split:
+			self._write_split(graph, Path(write_path))
+		else:
+			self._write(write_path, self._table_of_contents(graph), self._entities(graph))
 
 		if show:
 			wb.open(write_path)
 
-	def _table_of_contents(self, graph):
+		return write_path
+
+	def _write(self, write_path, *sections):
+		with open(write_path, 'w') as f:
+			f.write(self.PAGE_START())
+			for lines in sections:
+				f.writelines(lines)
+			f.write(self.PAGE_END())
+
+	def _write_split(self, graph, write_path):
+		modules = {}
+		for name in graph.nodes:
+			modules.setdefault(module_of(name), []).append(name)
+		pages = {module: write_path.with_name(f"{write_path.stem}.{module}{write_path.suffix}") for module in modules}
+		href = lambda name: f"{pages[module_of(name)].name}#{name}"
+
+		self._write(write_path, self._table_of_contents(graph, href))
+		data_by_domain = self._data_by_domain(graph)
+		for module, names in modules.items():
+			header = [f"<a href='{write_path.name}'>Table of Contents</a>", f"<h3>{module}</h3>"]
+			self._write(pages[module], header, self._entities(graph, names, href, data_by_domain))
+
+	def _table_of_contents(self, graph, href=None):
+		""" Yields the lines of the table of contents, href(name) is the link to an entity (an anchor by default). """
+		href = href or anchor
 		classes = sorted(list(graph.nodes))
 		padding = max(len(n) for n in graph.nodes)
 
-		lines = []
-		lines.append("<h3>Table of Contents</h3>")
+		yield "<h3>Table of Contents</h3>"
 		current_module = None
 		for c in classes:
-			module = str(c).split('.')[0]
+			module = module_of(c)
 			if current_module != module:
+				if current_module is not None:
+					yield '</table>'
 				current_module = module
-				lines.append(f"<b>{module}</b>")
-			lines.append("<table>")
-			lines.append(f"<tr><td style='text-indent:50px'><a href='#{str(c)}'>{str(c):{padding}}</a></td></tr>")
-			lines.append('</table>')
-		lines.append('<hr>')
-		return lines
-
-	def _entities(self, graph):
+				yield f"<b>{module}</b>"
+				yield "<table>"
+			yield f"<tr><td style='text-indent:50px'><a href='{href(str(c))}'>{str(c):{padding}}</a></td></tr>"
+		if current_module is not None:
+			yield '</table>'
+		yield '<hr>'
+
+	def _data_by_domain(self, graph):
+		""" The datatypes of each entity, in the order of the graph's nodes. """
+		data_by_domain = {}
+		for data_name, data_node in graph.nodes.items():
+			if data_node.get('type') != 'datatype':  # Nodes only known as the target of an edge have no type
+				continue
+
+			for entity_group in data_node['domain']:
+				assert len(entity_group) == 1
+			domain_entities = [entity_group[0] for entity_group in data_node['domain']]
+			for entity in dict.fromkeys(domain_entities):
+				data_by_domain.setdefault(entity, []).append((data_name, data_node, len(domain_entities) > 1))
+		return data_by_domain
+
+	def _entities(self, graph, names=None, href=None, data_by_domain=None):
+		""" Yields the lines of the section of each entity in names, all of them by default. """
 		# Not sure how this handles multiple inheritance or inferred classes yet.
 		thick_hrule = "<hr style='height:5px;border:none;color:#333;background-color:#333;'>"
 		left_arrow = ' &#8592; '
 		padding = max(len(n) for n in graph.nodes)
+		href = href or anchor
+		if data_by_domain is None:
+			data_by_domain = self._data_by_domain(graph)
 
-		lines = ["<table>"]
-		lines.append(thick_hrule)
+		yield "<table>"
+		yield thick_hrule
 		
 
-		for name, node in graph.nodes.items():
-			if node['type'] != 'entity':
+		nodes = graph.nodes.items() if names is None else ((name, graph.nodes[name]) for name in names)
+		for name, node in nodes:
+			if node.get('type') != 'entity':
 				continue
 
 
 			## 1. Title String
-			ancestors_string = left_arrow + left_arrow.join([f"<a href='#{a}'>{a}</a>" for a in reversed(node['ancestors'])])
+			ancestors_string = left_arrow + left_arrow.join([f"<a href='{href(a)}'>{a}</a>" for a in reversed(node['ancestors'])])
 			title_string = f"<b style='font-size:150%;background-color:orange;'>{name.split('.')[-1]:{padding}}</b> {ancestors_string} ({len(node['ancestors'])})"
-			lines.append(f"<tr><td id={name}>")
-			lines.append(f"{title_string}")
+			yield f"<tr><td id={name}>"
+			yield f"{title_string}"
 
 			
 			# 2. Definition String
-			lines.append(f"<p style='font-size:120%;'><b style='background-color:orange;'>Definition:</b> {node['definition']}</p>")
+			yield f"<p style='font-size:120%;'><b style='background-color:orange;'>Definition:</b> {node['definition']}</p>"
 			
 
 			# 3. Assertion String
 			# 4. Relations String
 			# 5. Properties String
-			lines.append('<hr>')
-			for data_name, data_node in graph.nodes.items():
-				if data_node['type'] != 'datatype':
-					continue
+			yield '<hr>'
+			for data_name, data_node, common in data_by_domain.get(name, []):
+				yield "<span style='background-color:green'><b style='font-size:120%'>" + data_name.split('.')[-1] + '</b></span>' + (' (Common Key)' if common else '') + '<br>'
+				yield data_node['description'].strip() + ('<br>' if data_node['description'].strip() else '') + '<br>'
+				yield '<hr>'
+
+			yield thick_hrule
+			yield f"</td></tr>"
+		yield "</table>"
+
+
+def module_of(name):
+	""" The module of an entity, eg: small for small.Asset. """
+	return str(name).split('.')[0]
+
 
-				for entity_group in data_node['domain']:
-					assert len(entity_group) == 1
-				domain_entities = [entity_group[0] for entity_group in data_node['domain']]
-				
-				if name in domain_entities:
-					lines.append("<span style='background-color:green'><b style='font-size:120%'>" + data_name.split('.')[-1] + '</b></span>' + (' (Common Key)' if len(domain_entities) > 1 else '') + '<br>')
-					lines.append(data_node['description'].strip() + ('<br>' if data_node['description'].strip() else '') + '<br>')
-					lines.append('<hr>')
-
-			lines.append(thick_hrule)
-			lines.append(f"</td></tr>")
-		lines.append("</table>")
-		return lines
+def anchor(name):
+	return f"#{name}"
 
 
 